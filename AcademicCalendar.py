@@ -0,0 +1,132 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USThanksgivingDay, nearest_workday)
+from pandas.tseries.offsets import DateOffset, Day
+from dateutil.relativedelta import TH
+
+from ParkingCube import CUBE_EPOCH
+
+# Per-day academic calendar features, stored as one small int8 array indexed by day offset
+# from CUBE_EPOCH (the same index as the hourly cube divided by 24). Daily or hourly
+# aggregates pick up their calendar columns with calendar[day] instead of a date merge.
+# The array takes a few milliseconds to build, so it is rebuilt on every load and edits to
+# TERMS, the holiday rules or the home games file take effect immediately.
+
+# Home game dates (one DATE per row, any sport at a campus venue); optional
+HOME_GAMES_CSV = 'home_games.csv'
+
+CALENDAR_FEATURES = ['SEMESTER', 'FINALS', 'BREAK', 'HOLIDAY', 'HOME_GAME']
+# Through the end of the dashboards' forecast horizon
+CALENDAR_END = pd.Timestamp('2026-12-31')
+CALENDAR_DAYS = (CALENDAR_END - CUBE_EPOCH).days + 1
+
+# Fall and spring terms from the published academic calendar; add new terms as they are announced.
+# Recesses are days inside the term with no classes. TERMS must run up to CALENDAR_END: days
+# after the last listed finals are winter break through CALENDAR_END and unknown after it.
+TERMS = [
+    {'name': 'Spring 2023', 'classes': ('2023-01-24', '2023-05-05'), 'finals': ('2023-05-07', '2023-05-12'),
+     'recesses': [('2023-03-11', '2023-03-19')]},
+    {'name': 'Fall 2023', 'classes': ('2023-09-06', '2023-12-13'), 'finals': ('2023-12-15', '2023-12-21'),
+     'recesses': [('2023-11-23', '2023-11-26')]},
+    {'name': 'Spring 2024', 'classes': ('2024-01-23', '2024-05-03'), 'finals': ('2024-05-05', '2024-05-10'),
+     'recesses': [('2024-03-23', '2024-03-31')]},
+    {'name': 'Fall 2024', 'classes': ('2024-09-04', '2024-12-11'), 'finals': ('2024-12-13', '2024-12-19'),
+     'recesses': [('2024-11-28', '2024-12-01')]},
+    {'name': 'Spring 2025', 'classes': ('2025-01-21', '2025-05-02'), 'finals': ('2025-05-04', '2025-05-09'),
+     'recesses': [('2025-03-15', '2025-03-23')]},
+    {'name': 'Fall 2025', 'classes': ('2025-09-03', '2025-12-10'), 'finals': ('2025-12-12', '2025-12-18'),
+     'recesses': [('2025-11-27', '2025-11-30')]},
+    {'name': 'Spring 2026', 'classes': ('2026-01-20', '2026-05-01'), 'finals': ('2026-05-03', '2026-05-08'),
+     'recesses': [('2026-03-28', '2026-04-05')]},
+    # Projected from the usual pattern; confirm against the registrar once published
+    {'name': 'Fall 2026', 'classes': ('2026-09-02', '2026-12-09'), 'finals': ('2026-12-11', '2026-12-17'),
+     'recesses': [('2026-11-26', '2026-11-29')]},
+]
+
+
+class UniversityHolidayCalendar(AbstractHolidayCalendar):
+    # University holidays: federal holidays less Presidents', Columbus and Veterans Day, plus
+    # the day after Thanksgiving and Christmas / New Year's Eve
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=nearest_workday),
+        USMartinLutherKingJr,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Day after Thanksgiving', month=11, day=1, offset=[DateOffset(weekday=TH(4)), Day(1)]),
+        Holiday('Christmas Eve', month=12, day=24),
+        Holiday('Christmas Day', month=12, day=25, observance=nearest_workday),
+        Holiday("New Year's Eve", month=12, day=31),
+    ]
+
+
+def day_offsets(dates):
+    # Integer day index into the calendar for datetimes (any time of day)
+    return ((pd.DatetimeIndex(dates).normalize() - CUBE_EPOCH) // pd.Timedelta(days=1)).to_numpy()
+
+
+def mark(flags, start, end):
+    # Set flags for the inclusive date range start..end, clipped to the calendar
+    first, last = day_offsets([start, end])
+    flags[max(first, 0):max(last + 1, 0)] = 1
+
+
+def build_calendar(n_days=CALENDAR_DAYS, home_games_path=HOME_GAMES_CSV):
+    calendar = np.zeros((n_days, len(CALENDAR_FEATURES)), dtype=np.int8)
+    semester, finals, breaks, holiday, home_game = (calendar[:, i] for i in range(len(CALENDAR_FEATURES)))
+
+    recess = np.zeros(n_days, dtype=np.int8)
+    for term in TERMS:
+        mark(semester, *term['classes'])
+        mark(finals, *term['finals'])
+        for start, end in term['recesses']:
+            mark(recess, start, end)
+    semester[recess == 1] = 0
+    # Everything that is neither a class day nor finals is a break (winter, summer, recesses),
+    # up to CALENDAR_END; later days are unknown and left unflagged
+    breaks[:CALENDAR_DAYS] = (semester[:CALENDAR_DAYS] == 0) & (finals[:CALENDAR_DAYS] == 0)
+
+    end = CUBE_EPOCH + pd.Timedelta(days=n_days - 1)
+    holidays = UniversityHolidayCalendar().holidays(start=CUBE_EPOCH, end=end)
+    holiday[day_offsets(holidays)] = 1
+
+    if os.path.exists(home_games_path):
+        games = day_offsets(pd.to_datetime(pd.read_csv(home_games_path)['DATE']))
+        home_game[games[(games >= 0) & (games < n_days)]] = 1
+    return calendar
+
+
+def load_calendar(n_days=CALENDAR_DAYS):
+    # Returns an int8 (n_days, len(CALENDAR_FEATURES)) array
+    return build_calendar(n_days)
+
+
+def calendar_version(calendar=None):
+    # Fingerprint of the flags, for caches of results that depend on them
+    calendar = load_calendar() if calendar is None else calendar
+    return hashlib.sha256(calendar.tobytes()).hexdigest()[:16]
+
+
+def prophet_holidays(calendar=None):
+    # Calendar flags as a Prophet holidays frame: one row per flagged day, named by feature
+    calendar = load_calendar() if calendar is None else calendar
+    days, features = np.nonzero(calendar[:, 1:])
+    return pd.DataFrame({
+        'holiday': np.array(CALENDAR_FEATURES[1:])[features],
+        'ds': CUBE_EPOCH + pd.to_timedelta(days, unit='D'),
+    })
+
+
+if __name__ == '__main__':
+    calendar = load_calendar()
+    dates = CUBE_EPOCH + pd.to_timedelta(np.arange(len(calendar)), unit='D')
+    summary = pd.DataFrame(calendar, columns=CALENDAR_FEATURES).groupby(dates.year).sum()
+    print(f"Calendar features for {len(calendar):,} days from {CUBE_EPOCH.date()}")
+    print(summary.to_string())
+    if not os.path.exists(HOME_GAMES_CSV):
+        print(f"{HOME_GAMES_CSV} not found; HOME_GAME is all zero")
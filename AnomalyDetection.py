@@ -0,0 +1,201 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import stats
+
+from ParkingCube import CACHE_DIR, CUBE_EPOCH, HOURS_OF_WEEK, load_hourly_cube, week_blocks
+
+# Flags facility-hours whose entry count departs from that facility's typical demand for
+# the same hour of the week (gate outages, event surges). The baseline for each
+# facility x hour-of-week is the median and MAD of the same hour over the previous
+# BASELINE_WEEKS weeks, so it is causal and robust to the outliers it is looking for.
+# The first run backfills the whole cube; later runs score only the hours added since,
+# from a ring buffer of each hour-of-week's recent counts, and append their intervals.
+
+INTERVALS_PATH = os.path.join(CACHE_DIR, 'anomaly_intervals.csv')
+STATE_PATH = os.path.join(CACHE_DIR, 'anomaly_state.npz')
+
+BASELINE_WEEKS = 8
+MIN_HISTORY_WEEKS = 4
+Z_THRESHOLD = 4.0
+# Poisson rate assumed for hours whose baseline is below it, so a handful of cars at an
+# hour that is usually empty is not a surge
+MIN_RATE = 1.0
+
+
+def robust_score(counts, windows):
+    # windows carries the baseline history on its last axis, counts matches the rest
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        baseline = np.nanmedian(windows, axis=-1)
+        mad = np.nanmedian(np.abs(windows - baseline[..., None]), axis=-1)
+    history = np.sum(~np.isnan(windows), axis=-1)
+    scale = np.maximum(1.4826 * mad, np.sqrt(np.maximum(baseline, MIN_RATE)))
+    robust = (counts - baseline) / scale
+    # The same count's Poisson tail probability as a z-score. At low counts the normal
+    # approximation above overstates how unusual a count is (MAD is zero for hours that
+    # are almost always empty), so a count has to be extreme under both.
+    rate = np.maximum(np.nan_to_num(baseline), MIN_RATE)
+    tail = np.where(counts > baseline, stats.poisson.sf(counts - 1, rate), stats.poisson.cdf(counts, rate))
+    poisson = np.sign(robust) * stats.norm.isf(np.minimum(tail, 0.5))
+    score = np.where(np.abs(robust) < np.abs(poisson), robust, poisson)
+    score = np.where(history >= MIN_HISTORY_WEEKS, score, np.nan)
+    return baseline, score
+
+
+def backfill_scores(cube, baseline_weeks=BASELINE_WEEKS):
+    # Score every facility-hour in one pass; returns (baseline, score) shaped like the cube
+    blocks, lead = week_blocks(cube)
+    n_facilities, n_weeks, _ = blocks.shape
+    padded = np.concatenate([np.full((n_facilities, baseline_weeks, HOURS_OF_WEEK), np.nan), blocks], axis=1)
+    # Window for week w covers weeks w - baseline_weeks .. w - 1
+    windows = sliding_window_view(padded, baseline_weeks, axis=1)[:, :n_weeks]
+    baseline, score = robust_score(blocks, windows)
+    end = lead + cube.shape[1]
+    return baseline.reshape(n_facilities, -1)[:, lead:end], score.reshape(n_facilities, -1)[:, lead:end]
+
+
+def flag_intervals(cube, facility_names, baseline, score, threshold=Z_THRESHOLD, first_hour=0):
+    # Merge consecutive flagged hours with the same direction into one interval; the arrays
+    # may cover only the cube hours from first_hour on
+    flagged = np.nan_to_num(np.abs(score)) >= threshold
+    fac, hour = np.nonzero(flagged)
+    sign = np.sign(score[fac, hour])
+    new_run = np.ones(len(fac), dtype=bool)
+    new_run[1:] = (fac[1:] != fac[:-1]) | (hour[1:] != hour[:-1] + 1) | (sign[1:] != sign[:-1])
+
+    hours = pd.DataFrame({
+        'RUN': np.cumsum(new_run) - 1,
+        'FACILITY_NAME': np.asarray(facility_names)[fac],
+        'HOUR': hour + first_hour,
+        'COUNT': cube[fac, hour],
+        'BASELINE': baseline[fac, hour],
+        'SCORE': score[fac, hour],
+    })
+    intervals = hours.groupby('RUN').agg(
+        FACILITY_NAME=('FACILITY_NAME', 'first'),
+        START_HOUR=('HOUR', 'min'), END_HOUR=('HOUR', 'max'),
+        COUNT=('COUNT', 'sum'), BASELINE=('BASELINE', 'sum'),
+    ).reset_index(drop=True)
+    peak = hours['SCORE'].abs().groupby(hours['RUN']).idxmax()
+    intervals['PEAK_SCORE'] = hours.loc[peak, 'SCORE'].to_numpy()
+    intervals['START'] = CUBE_EPOCH + pd.to_timedelta(intervals['START_HOUR'], unit='h')
+    intervals['END'] = CUBE_EPOCH + pd.to_timedelta(intervals['END_HOUR'] + 1, unit='h')
+    intervals['HOURS'] = intervals['END_HOUR'] - intervals['START_HOUR'] + 1
+    intervals['DIRECTION'] = np.where(intervals['PEAK_SCORE'] > 0, 'Surge', 'Drop')
+    return intervals.drop(columns=['START_HOUR', 'END_HOUR'])
+
+
+def init_stream_state(cube, facility_names, baseline_weeks=BASELINE_WEEKS):
+    # Ring buffer of the last baseline_weeks observations of every facility x hour-of-week,
+    # oldest first, so ongoing hours can be scored without touching the history again
+    blocks, lead = week_blocks(cube)
+    n_weeks = blocks.shape[1]
+    next_hour = cube.shape[1]
+    how = np.arange(HOURS_OF_WEEK)
+    # Hours-of-week not yet seen in the final (partial) week end one week earlier
+    last_week = np.where(how < (lead + next_hour) - (n_weeks - 1) * HOURS_OF_WEEK, n_weeks - 1, n_weeks - 2)
+    weeks = last_week[None, :] - np.arange(baseline_weeks)[::-1, None]
+    ring = np.where(weeks >= 0, blocks[:, np.maximum(weeks, 0), how], np.nan)
+    return {
+        'ring': ring,
+        'position': np.zeros(HOURS_OF_WEEK, dtype=np.int64),
+        'next_hour': next_hour,
+        'facilities': np.array(facility_names),
+    }
+
+
+def update_stream(state, counts):
+    # Score the next hour's counts (one per facility) and fold them into the baseline; O(1) per facility
+    how = (CUBE_EPOCH.dayofweek * 24 + CUBE_EPOCH.hour + state['next_hour']) % HOURS_OF_WEEK
+    counts = np.asarray(counts, dtype=np.float64)
+    baseline, score = robust_score(counts, state['ring'][:, :, how])
+    state['ring'][:, state['position'][how], how] = counts
+    state['position'][how] = (state['position'][how] + 1) % state['ring'].shape[1]
+    state['next_hour'] += 1
+    return baseline, score
+
+
+def merge_adjacent(intervals):
+    # Join an interval that starts exactly where the previous one of the same facility and
+    # direction ended, e.g. a run split across two updates
+    intervals = intervals.sort_values(['FACILITY_NAME', 'START']).reset_index(drop=True)
+    same = intervals[['FACILITY_NAME', 'DIRECTION']].eq(intervals[['FACILITY_NAME', 'DIRECTION']].shift()).all(axis=1)
+    run = np.cumsum(~(same & (intervals['START'] == intervals['END'].shift())))
+    merged = intervals.groupby(run).agg(
+        FACILITY_NAME=('FACILITY_NAME', 'first'), COUNT=('COUNT', 'sum'), BASELINE=('BASELINE', 'sum'),
+        START=('START', 'min'), END=('END', 'max'), HOURS=('HOURS', 'sum'), DIRECTION=('DIRECTION', 'first'),
+    ).reset_index(drop=True)
+    peak = intervals['PEAK_SCORE'].abs().groupby(run).idxmax()
+    merged['PEAK_SCORE'] = intervals.loc[peak, 'PEAK_SCORE'].to_numpy()
+    return merged[intervals.columns]
+
+
+def stream_intervals(cube, facility_names, state):
+    # Score the cube hours added since state was saved, one hour at a time, and flag them;
+    # None if the state does not line up with this cube and a backfill is needed
+    first_hour = state['next_hour']
+    if state['facilities'].tolist() != list(facility_names) or first_hour > cube.shape[1]:
+        return None
+    new = cube[:, first_hour:]
+    baseline = np.empty(new.shape)
+    score = np.empty(new.shape)
+    for i in range(new.shape[1]):
+        baseline[:, i], score[:, i] = update_stream(state, new[:, i])
+    return flag_intervals(new, facility_names, baseline, score, first_hour=first_hour)
+
+
+def save_stream_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **state)
+    os.replace(path + '.tmp', path)
+
+
+def save_anomalies(intervals, path=INTERVALS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    intervals.to_csv(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def load_stream_state(path=STATE_PATH):
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files}
+    state['next_hour'] = int(state['next_hour'])
+    return state
+
+
+def load_anomalies(path=INTERVALS_PATH):
+    # Returns None until AnomalyDetection.py has been run
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, parse_dates=['START', 'END'])
+
+
+if __name__ == '__main__':
+    cube, facility_names = load_hourly_cube()
+    previous = load_anomalies()
+    state = load_stream_state() if previous is not None and os.path.exists(STATE_PATH) else None
+
+    start = time.perf_counter()
+    first_hour = state['next_hour'] if state is not None else 0
+    intervals = stream_intervals(cube, facility_names, state) if state is not None else None
+    if intervals is not None:
+        intervals = merge_adjacent(pd.concat([previous, intervals], ignore_index=True))
+    else:
+        # First run, or the cube no longer matches the saved state: score the whole cube
+        first_hour = 0
+        baseline, score = backfill_scores(cube)
+        intervals = flag_intervals(cube, facility_names, baseline, score)
+        state = init_stream_state(cube, facility_names)
+    elapsed = time.perf_counter() - start
+
+    save_anomalies(intervals)
+    save_stream_state(state)
+
+    print(f"Scored {cube.shape[0] * (cube.shape[1] - first_hour):,} facility-hours in {elapsed:.1f}s")
+    print(f"Flagged {len(intervals):,} intervals "
+          f"({(intervals['DIRECTION'] == 'Surge').sum():,} surges, {(intervals['DIRECTION'] == 'Drop').sum():,} drops)")
@@ -0,0 +1,203 @@
+import functools
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from ParkingCube import CACHE_DIR
+
+# Disk-backed cache of Dash callback results, shared by every worker process that opens the
+# same SQLite file. Keys are the callback name plus a hash of its source, its inputs and
+# the data version, so a repeat page load is one indexed read and an unpickle instead of a
+# recompute, and editing a callback retires what it cached.
+# Entries are evicted least-recently-used once the store passes its size or entry limit.
+# Hit and miss counts live in the same file, so they cover all workers, and so does the
+# record of which data versions have been warmed, so only one worker warms each version.
+
+CALLBACK_CACHE_PATH = os.path.join(CACHE_DIR, 'callback_cache.sqlite')
+SIZE_LIMIT = 512 * 1024 * 1024
+MAX_ENTRIES = 5000
+STATS_ROUTE = '/cache-stats'
+# A warm-up that has not finished after this long is assumed dead and may be claimed again
+WARM_UP_TIMEOUT = 3600
+
+
+def plain(value):
+    # Figures are stored as their plotly JSON dicts, which Dash accepts as outputs and which
+    # unpickle without re-running plotly's property validation
+    if hasattr(value, 'to_plotly_json'):
+        return value.to_plotly_json()
+    if isinstance(value, (list, tuple)):
+        return type(value)(plain(item) for item in value)
+    return value
+
+
+def reloader_watcher(module_name, debug):
+    # True in the parent process of the debug reloader, which only watches files and never
+    # serves; a WSGI server imports the module under its own name and always serves
+    return module_name == '__main__' and debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+
+def data_version(paths=()):
+    # Fingerprint of the given input files and stage outputs; list only what the dashboard
+    # reads, so rebuilding an unrelated stage does not change the version and every key
+    stamps = [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths if os.path.exists(path)]
+    return hashlib.sha256(json.dumps(stamps).encode()).hexdigest()[:16]
+
+
+def code_version(func):
+    # Fingerprint of a callback's source; falls back to its bytecode when there is no source
+    try:
+        source = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        source = marshal.dumps(func.__code__)
+    return hashlib.sha256(source).hexdigest()[:16]
+
+
+class CallbackCache:
+
+    def __init__(self, version, path=CALLBACK_CACHE_PATH, size_limit=SIZE_LIMIT, max_entries=MAX_ENTRIES):
+        self.version = version
+        self.warm_up_version = version
+        self.path = path
+        self.size_limit = size_limit
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                         '(key TEXT PRIMARY KEY, name TEXT, value BLOB, size INTEGER, last_access REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, hits INTEGER, misses INTEGER, '
+                         'compute_seconds REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS warm_ups (version TEXT PRIMARY KEY, started REAL, finished REAL)')
+
+    def connect(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def key(self, name, code, args, kwargs):
+        payload = json.dumps([name, code, self.version, args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, name, key):
+        # Returns (found, value) and counts the lookup
+        with closing(self.connect()) as conn, conn:
+            row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            self.count(conn, name, hit=row is not None)
+        return (True, pickle.loads(row[0])) if row is not None else (False, None)
+
+    def set(self, name, key, value, seconds=0.0):
+        blob = pickle.dumps(plain(value), protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self.connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (key, name, blob, len(blob), time.time()))
+            conn.execute('UPDATE stats SET compute_seconds = compute_seconds + ? WHERE name = ?', (seconds, name))
+            self.evict(conn)
+
+    def evict(self, conn):
+        # Keep the most recently used entries that fit within both limits
+        conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries '
+                     'ORDER BY last_access DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER '
+                     '(ORDER BY last_access DESC) AS running FROM entries) WHERE running > ?)', (self.size_limit,))
+
+    def count(self, conn, name, hit):
+        conn.execute('INSERT OR IGNORE INTO stats VALUES (?, 0, 0, 0.0)', (name,))
+        column = 'hits' if hit else 'misses'
+        conn.execute(f'UPDATE stats SET {column} = {column} + 1 WHERE name = ?', (name,))
+
+    def memoize(self, name=None):
+        # Cache a callback's return value by its arguments; put this under @app.callback
+        def decorator(func):
+            callback_name = name or func.__name__
+            code = code_version(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = self.key(callback_name, code, args, kwargs)
+                found, value = self.get(callback_name, key)
+                if found:
+                    return value
+                start = time.perf_counter()
+                value = func(*args, **kwargs)
+                self.set(callback_name, key, value, time.perf_counter() - start)
+                return value
+            wrapper.code_version = code
+            return wrapper
+        return decorator
+
+    def claim_warm_up(self, version):
+        # Atomically claim a warm-up; False if another process already has it
+        now = time.time()
+        with closing(self.connect()) as conn, conn:
+            claimed = conn.execute('INSERT INTO warm_ups VALUES (?, ?, NULL) ON CONFLICT (version) DO UPDATE '
+                                   'SET started = excluded.started WHERE finished IS NULL AND started < ?',
+                                   (version, now, now - WARM_UP_TIMEOUT)).rowcount
+        return claimed == 1
+
+    def warm_up(self, calls, background=True):
+        # calls is a list of (memoized function, args); fills the cache for the default views,
+        # once per data version and callback code across all workers
+        codes = [getattr(func, 'code_version', None) for func, _ in calls]
+        self.warm_up_version = self.version + hashlib.sha256(json.dumps(codes).encode()).hexdigest()[:16]
+        if not self.claim_warm_up(self.warm_up_version):
+            return
+
+        def run():
+            start = time.perf_counter()
+            try:
+                for func, args in calls:
+                    func(*args)
+                print(f"Callback cache warmed with {len(calls)} views in {time.perf_counter() - start:.1f}s")
+            finally:
+                with closing(self.connect()) as conn, conn:
+                    conn.execute('UPDATE warm_ups SET finished = ? WHERE version = ?',
+                                 (time.time(), self.warm_up_version))
+        if not background:
+            return run()
+        threading.Thread(target=run, daemon=True).start()
+
+    def stats(self):
+        with closing(self.connect()) as conn:
+            callbacks = conn.execute('SELECT name, hits, misses, compute_seconds FROM stats ORDER BY name').fetchall()
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            warm_up = conn.execute('SELECT started, finished FROM warm_ups WHERE version = ?',
+                                   (self.warm_up_version,)).fetchone()
+        hits = sum(row[1] for row in callbacks)
+        misses = sum(row[2] for row in callbacks)
+        return {
+            'version': self.version,
+            'entries': entries,
+            'bytes': size,
+            'size_limit': self.size_limit,
+            'warm_up': None if warm_up is None else ('finished' if warm_up[1] is not None else 'running'),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+            'callbacks': {name: {'hits': h, 'misses': m, 'compute_seconds': s} for name, h, m, s in callbacks},
+        }
+
+    def register_stats_route(self, app, route=STATS_ROUTE):
+        # Serve the hit/miss metrics as JSON from the Dash app's Flask server
+        app.server.add_url_rule(route, 'callback_cache_stats', lambda: self.stats())
+
+    def clear(self):
+        with closing(self.connect()) as conn, conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM stats')
+            conn.execute('DELETE FROM warm_ups')
+
+
+if __name__ == '__main__':
+    cache = CallbackCache(version=None)
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,174 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from ParkingCube import CHUNK_SIZE, KNOWN_FACILITIES, TRANSACTIONS_CSV, TRANSACTIONS_RAW_CSV, facility_key
+
+# Validates raw T2 exports in one streaming pass and writes the *_cleaned.csv files the
+# analysis scripts read. Rows that fail a check go to a quarantine file with every
+# reason code that applies; nothing is silently dropped or fixed up. Outputs are written to
+# temporary files and only replace the live ones once the whole export has been processed.
+
+EXPORTS = {
+    'transactions': {
+        'raw': TRANSACTIONS_RAW_CSV,
+        'cleaned': TRANSACTIONS_CSV,
+        'quarantine': 'Parking Transactions from 2023-01-01_quarantine.csv',
+        'uid': 'PARKING_TRANSACTION_UID',
+        'facility': 'FACILITY_NAME',
+        'datetimes': {'ENTRY': ('ENTRY_DATE_ONLY', 'ENTRY_TIME_ONLY'),
+                      'EXIT': ('EXIT_DATE_ONLY', 'EXIT_TIME_ONLY')},
+        # Cars still parked at export time and missed exit reads have no exit; the exit is
+        # only checked when it is there
+        'optional_datetimes': ['EXIT'],
+        'numeric': ['PARKING_TRANSACTION_UID'],
+    },
+    'entry_exit': {
+        'raw': 'T2_Warehouse_EntryExitIncident.csv',
+        'cleaned': 'T2_Warehouse_EntryExitIncident_cleaned.csv',
+        'quarantine': 'T2_Warehouse_EntryExitIncident_quarantine.csv',
+        'uid': None,
+        'facility': 'FACILITY_NAME',
+        'datetimes': {'EVENT': ('DATE', 'TIME')},
+        'required': ['PARKING_TYPE'],
+    },
+    'lot_full': {
+        'raw': 'LotFullIncidents.csv',
+        'cleaned': 'LotFullIncidents_cleaned.csv',
+        'quarantine': 'LotFullIncidents_quarantine.csv',
+        'uid': 'INC_UID',
+        'facility': 'FAC_DESCRIPTION',
+        'datetimes': {'INCIDENT': ('Date', 'Time')},
+    },
+}
+
+# Lot-full incidents name facilities differently, so facilities are compared by lot number
+KNOWN_FACILITY_KEYS = {facility_key(name) for name in KNOWN_FACILITIES}
+
+
+def required_columns(spec):
+    # Columns every row must have a value in
+    optional = spec.get('optional_datetimes', [])
+    columns = [spec['facility']] + [column for name, pair in spec['datetimes'].items() if name not in optional
+                                    for column in pair]
+    if spec['uid']:
+        columns.insert(0, spec['uid'])
+    return columns + spec.get('required', [])
+
+
+def expected_columns(spec):
+    # Columns the export header must have, including optional ones
+    optional = [column for name in spec.get('optional_datetimes', []) for column in spec['datetimes'][name]]
+    return required_columns(spec) + optional
+
+
+def validate_chunk(chunk, spec, seen_uids):
+    # Returns (boolean reason matrix, updated seen_uids); one column per reason code
+    reasons = {}
+    columns = required_columns(spec)
+    missing = chunk[columns].isna().any(axis=1)
+    for name in spec.get('optional_datetimes', []):
+        # An optional date and time must be both present or both missing
+        date_column, time_column = spec['datetimes'][name]
+        missing |= chunk[date_column].isna() != chunk[time_column].isna()
+    reasons['MISSING_VALUE'] = missing
+
+    parsed = {}
+    bad_datetime = pd.Series(False, index=chunk.index)
+    for name, (date_column, time_column) in spec['datetimes'].items():
+        text = chunk[date_column] + ' ' + chunk[time_column]
+        parsed[name] = pd.to_datetime(text, errors='coerce')
+        bad_datetime |= text.notna() & parsed[name].isna()
+    reasons['BAD_DATETIME'] = bad_datetime
+    if 'EXIT' in parsed:
+        reasons['EXIT_BEFORE_ENTRY'] = parsed['EXIT'] < parsed['ENTRY']
+
+    facilities = chunk[spec['facility']]
+    names = pd.Series(facilities.dropna().unique())
+    known = set(names[names.map(facility_key).isin(KNOWN_FACILITY_KEYS)])
+    reasons['UNKNOWN_FACILITY'] = facilities.notna() & ~facilities.isin(known)
+
+    bad_number = pd.Series(False, index=chunk.index)
+    for column in spec.get('numeric', []):
+        bad_number |= chunk[column].notna() & pd.to_numeric(chunk[column], errors='coerce').isna()
+    reasons['BAD_NUMBER'] = bad_number
+
+    if spec['uid']:
+        uids = chunk[spec['uid']]
+        # Hash UIDs to uint64 so earlier chunks are remembered as one sorted array
+        hashes = pd.util.hash_pandas_object(uids.fillna(''), index=False).to_numpy()
+        position = np.minimum(np.searchsorted(seen_uids, hashes), max(len(seen_uids) - 1, 0))
+        seen_before = seen_uids[position] == hashes if len(seen_uids) else np.zeros(len(hashes), dtype=bool)
+        duplicate = pd.Series(hashes).duplicated().to_numpy() | seen_before
+        reasons['DUPLICATE_UID'] = pd.Series(duplicate, index=chunk.index) & uids.notna()
+        # Both halves are sorted, so the stable sort is a linear merge
+        seen_uids = np.sort(np.concatenate([seen_uids, np.sort(hashes)]), kind='stable')
+
+    return pd.DataFrame(reasons), seen_uids
+
+
+def clean_export(kind, raw_path=None, chunksize=CHUNK_SIZE):
+    spec = EXPORTS[kind]
+    raw_path = raw_path or spec['raw']
+    header = pd.read_csv(raw_path, nrows=0).columns
+    missing = [column for column in expected_columns(spec) if column not in header]
+    if missing:
+        raise ValueError(f"{raw_path} is missing required columns: {', '.join(missing)}")
+    # The dashboards keep reading the previous outputs until this run has finished
+    outputs = {spec['cleaned']: spec['cleaned'] + '.tmp', spec['quarantine']: spec['quarantine'] + '.tmp'}
+    for path in outputs.values():
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    seen_uids = np.zeros(0, dtype=np.uint64)
+    rows = clean_rows = 0
+    reason_counts = {}
+    try:
+        # Read everything as text so type checks are ours, not read_csv's guesses
+        for chunk in pd.read_csv(raw_path, dtype=str, chunksize=chunksize):
+            reasons, seen_uids = validate_chunk(chunk, spec, seen_uids)
+            bad = reasons.any(axis=1)
+            codes = pd.Series(reasons.columns + '|', index=reasons.columns)
+            quarantine = chunk[bad].assign(REASON=reasons[bad].dot(codes).str.rstrip('|'))
+
+            first = rows == 0
+            chunk[~bad].to_csv(outputs[spec['cleaned']], mode='a', header=first, index=False)
+            if len(quarantine) or first:
+                quarantine.to_csv(outputs[spec['quarantine']], mode='a', header=first, index=False)
+
+            rows += len(chunk)
+            clean_rows += int((~bad).sum())
+            for reason, count in reasons.sum().items():
+                reason_counts[reason] = reason_counts.get(reason, 0) + int(count)
+        for path, tmp_path in outputs.items():
+            os.replace(tmp_path, path)
+    finally:
+        for tmp_path in outputs.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'export': kind,
+        'rows': rows,
+        'clean': clean_rows,
+        'quarantined': rows - clean_rows,
+        'reasons': reason_counts,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else float('inf'),
+    }
+
+
+if __name__ == '__main__':
+    for kind, spec in EXPORTS.items():
+        if not os.path.exists(spec['raw']):
+            print(f"Skipping {kind}: {spec['raw']} not found")
+            continue
+        report = clean_export(kind)
+        print(f"{kind}: {report['rows']:,} rows in {report['seconds']:.1f}s ({report['rows_per_second']:,.0f} rows/s), "
+              f"{report['quarantined']:,} quarantined")
+        for reason, count in report['reasons'].items():
+            if count:
+                print(f"  {reason}: {count:,}")
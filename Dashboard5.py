@@ -2,12 +2,23 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from dash import Dash, dcc, html, Input, Output
 from prophet import Prophet
 
+from ParkingCube import CUBE_PATH, KNOWN_FACILITIES, TRANSACTIONS_CSV, WEATHER_XLSX
+from FacilityClustering import CLUSTERS_PATH, K_SELECTION_PATH, load_clustering
+from DurationSketches import SKETCH_PATH, load_sketches, facility_quantiles
+from AnomalyDetection import INTERVALS_PATH, load_anomalies
+from PricingSimulator import SCENARIOS, simulation_inputs, run_scenarios
+from FeatureImportance import IMPORTANCE_PATH, importance_figure, load_feature_importance
+from WeatherRegression import CALENDAR_TERMS, REGRESSION_PATH, load_weather_regression, weather_fit_line
+from AcademicCalendar import calendar_version, prophet_holidays
+from CallbackCache import CallbackCache, data_version, reloader_watcher
+
 # Load all datasets
 entry_exit = pd.read_csv('T2_Warehouse_EntryExitIncident_cleaned.csv')
-transactions = pd.read_csv('Parking Transactions from 2023-01-01.csv')
+transactions = pd.read_csv(TRANSACTIONS_CSV)
 lot_full = pd.read_csv('LotFullIncidents_cleaned.csv')
 
 # Data Preparation
@@ -42,18 +53,57 @@ merged_data.drop(columns=['Date'], inplace=True)
 # Perform correlation analysis
 correlation = merged_data[['Parking_Count', 'Rainfall', 'Snowfall']].corr()
 
+# Load cached clustering results (run FacilityClustering.py to refresh)
+facility_clusters, cluster_k_selection = load_clustering()
+
+# Load duration sketches (run DurationSketches.py to ingest new transactions)
+duration_sketches, sketch_facilities, sketch_watermark = load_sketches()
+
+# Load flagged demand anomalies (run AnomalyDetection.py to refresh)
+anomaly_intervals = load_anomalies()
+
+# Load permutation feature importances (run FeatureImportance.py to refresh)
+feature_importance_df = load_feature_importance()
+
+# Load weather regression coefficients (run WeatherRegression.py to refresh)
+weather_regression = load_weather_regression()
+
+# Describe the fitted lines from the terms the regression actually has; terms missing from
+# the inputs (e.g. Temperature when the workbook has no such column) are not fitted
+if weather_regression is None:
+    regression_note = 'Run WeatherRegression.py to add fitted lines.'
+else:
+    fitted_terms = set(weather_regression['TERM'])
+    controls = [label for label, terms in [
+        ('temperature', ['Temperature']),
+        ('day of week', pd.date_range('2024-01-02', periods=6).day_name()),
+        ('month', pd.date_range('2024-02-01', periods=11, freq='MS').month_name()),
+        ('the academic calendar', CALENDAR_TERMS),
+    ] if fitted_terms.intersection(terms)]
+    controls = ', '.join(controls[:-1]) + ' and ' + controls[-1] if len(controls) > 1 else ''.join(controls)
+    regression_note = ("The lines are each weather term's effect from a regression"
+                       + (f' that also controls for {controls}.' if controls else '.'))
+
+# Finals, breaks, holidays and home games as Prophet holidays for the forecasts
+calendar_holidays = prophet_holidays()
+
+# Pricing simulator inputs: hour-of-week arrival rates and dwell distributions per facility
+pricing_facilities, pricing_rates, pricing_dwell, pricing_capacity = simulation_inputs()
+PRICING_WEEKS = 300
+
+# Callback results shared across workers; the version changes whenever an input file or a
+# stage output loaded above does
+callback_cache = CallbackCache(data_version(['T2_Warehouse_EntryExitIncident_cleaned.csv', TRANSACTIONS_CSV,
+                                             'LotFullIncidents_cleaned.csv', WEATHER_XLSX, CUBE_PATH,
+                                             CLUSTERS_PATH, K_SELECTION_PATH, SKETCH_PATH, INTERVALS_PATH,
+                                             IMPORTANCE_PATH, REGRESSION_PATH]) + calendar_version())
+
 # Initialize Dash app
+DEBUG = True
 app = Dash(__name__)
+callback_cache.register_stats_route(app)
 
-facility_names = [
-    '076  UNIV BAY DRIVE RAMP', '067  LINDEN DRIVE RAMP', '080  UNION SOUTH GARAGE', 
-    '046  LAKE & JOHNSON RAMP', '006U HC WHITE GARAGE UPPR', '007  GRAINGER HALL GARAGE', 
-    '075  UW HOSPITAL RAMP', '020  UNIVERSITY AVE RAMP', '017 ENGINEERING DR RAMP', 
-    '036  OBSERVATORY DR RAMP', '038  MICROBIAL SCI GARAGE', '029  N PARK STREET RAMP', 
-    '027  NANCY NICHOLAS HALL GARAGE', '083  FLUNO CENTER GARAGE', '023  VAN HISE GARAGE', 
-    '095  HEALTH SCI GARAGE', '006L HC WHITE GARAGE LOWR', '075V UW Hospital Valet', 
-    '063 CHILDRENS HOSP GARAGE'
-]
+facility_names = list(KNOWN_FACILITIES)
 
 app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px'}, children=[
     html.H1('Accurate Comprehensive Parking Facility Analysis Dashboard'),
@@ -88,9 +138,10 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
     html.Section([
         html.H2('3. Facility Clustering Analysis'),
         dcc.Graph(id='scatter-chart'),
-        html.P('This scatter plot clusters facilities based on their parking characteristics. '
-               'The X-axis represents the occupancy rate (how full the facility gets), and the Y-axis represents the turnover rate (how frequently cars come and go). '
-               'The size of the points indicates the average daily usage. Different colors represent different facilities. '
+        html.P('This scatter plot clusters facilities based on their hourly parking profiles. '
+               'Each facility-day is clustered on the shape of its 24-hour entry profile and its volume, with the number of clusters chosen by silhouette score. '
+               'The X and Y axes are the first two principal components of those profiles, the size of the points indicates the average daily usage, '
+               'and colors represent the cluster each facility falls into on most days. '
                'Clustering helps identify facilities with similar usage patterns, which can inform operational strategies.')
     ]),
 
@@ -98,9 +149,11 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
     html.Section([
         html.H2('4. Feature Importance for Parking Prediction'),
         dcc.Graph(id='importance-chart'),
-        html.P('This bar chart shows the importance of various features in predicting parking usage. '
-               'The Y-axis lists the features, and the X-axis shows their importance scores (0 to 1, where 1 is the most important). '
-               'Features like "Time of Day", "Day of Week", "Month", "Special Events", and "Weather" influence parking patterns. '
+        html.P('This bar chart shows the importance of various features in predicting hourly parking entries. '
+               'Importance is measured by permutation: a gradient-boosted tree model is fit to hourly counts per facility, '
+               'each feature is shuffled in turn, and the bar is the drop in held-out R^2, with error bars over repeated shuffles. '
+               'Grey bars are within their own noise, and the whole chart is marked unreliable when the model has no held-out skill. '
+               'Features are "Time of Day", "Day of Week", "Month", "Rainfall", "Snowfall", and "Facility"; special events are not yet included. '
                'Understanding feature importance helps in developing predictive models and making data-driven decisions.')
     ]),
     
@@ -131,7 +184,8 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
         dcc.Graph(id='scatter-plot'),
         html.P('This scatter plot shows the correlation between rainfall/snowfall and parking occupancy. '
                'Each point represents a day, with the X-axis showing the amount of rainfall or snowfall, '
-               'and the Y-axis showing the number of parking events. This helps to visualize how weather conditions impact parking occupancy.')
+               'and the Y-axis showing the number of parking events. This helps to visualize how weather conditions impact parking occupancy. '
+               + regression_note)
     ]),
 
     # Time Series Analysis: Overlay weather data with parking occupancy over time
@@ -141,6 +195,60 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
         html.P('This time series plot overlays the weather data (rainfall and snowfall) with parking occupancy over time. '
                'The X-axis represents the date, and the Y-axis shows the parking events and weather data. '
                'This helps to observe patterns and anomalies in parking occupancy in relation to weather conditions.')
+    ]),
+
+    # Heatmap of Parking Duration Percentiles by Day and Time
+    html.Section([
+        html.H2('9. Parking Duration Percentiles by Day and Time'),
+        dcc.Dropdown(
+            id='duration-quantile',
+            options=[{'label': 'Median (p50)', 'value': 0.5},
+                     {'label': 'p90', 'value': 0.9},
+                     {'label': 'p99', 'value': 0.99}],
+            value=0.9,
+            clearable=False
+        ),
+        dcc.Graph(id='duration-quantile-chart'),
+        html.P('This heatmap shows the selected percentile of parking duration for each hour of the day and each day of the week, '
+               'combined across the facilities selected above. '
+               'The X-axis represents the hour of entry, and the Y-axis represents the day of the week. '
+               'Percentiles are read from streaming duration sketches and are accurate to within 1% of the exact value.')
+    ]),
+
+    # Demand Anomalies by Facility
+    html.Section([
+        html.H2('10. Demand Anomalies by Facility'),
+        dcc.Graph(id='anomaly-chart'),
+        html.P('This timeline marks the hours where a facility\'s entries departed sharply from its usual demand for the same hour of the week. '
+               'The X-axis represents the date, and the Y-axis lists the facilities. '
+               'Surges (in red) can indicate events, while drops (in blue) can indicate gate outages or closures. '
+               'The size of each point reflects how far the count was from the facility\'s recent median for that hour.')
+    ]),
+
+    # Dynamic Pricing What-If
+    html.Section([
+        html.H2('11. Dynamic Pricing What-If'),
+        html.Label('Price change'),
+        dcc.Slider(id='price-change', min=-0.5, max=0.5, step=0.05, value=0.25,
+                   marks={v / 100: f'{v:+d}%' for v in range(-50, 51, 25)}),
+        html.Label('Price elasticity of demand'),
+        dcc.Slider(id='price-elasticity', min=-1.0, max=0.0, step=0.05, value=-0.3,
+                   marks={v / 10: f'{v / 10:.1f}' for v in range(-10, 1, 2)}),
+        dcc.RadioItems(
+            id='pricing-window',
+            options=[{'label': 'All hours', 'value': 'all'},
+                     {'label': 'Weekday peak (8 AM - 6 PM)', 'value': 'peak'},
+                     {'label': 'Off-peak', 'value': 'off_peak'}],
+            value='peak',
+            inline=True
+        ),
+        dcc.Graph(id='pricing-chart'),
+        html.P('This chart compares current pricing with the selected price change for each facility. '
+               'Arrivals for every hour of the week and how long cars stay are taken from the historical transactions, '
+               'demand is scaled by the price change and elasticity, and several hundred weeks are simulated. '
+               'Both scenarios are simulated on the same random draws, so the gap between the bars is the effect of the price change. '
+               'The top panel shows the probability that the lot fills at least once in a week, and the bottom panel the expected weekly revenue. '
+               'Capacity and hourly rate are assumed (100 spaces, $2/hour) until actual figures are configured.')
     ])
 ])
 
@@ -155,6 +263,7 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
      Output('time-series-analysis', 'figure')],
     [Input('facility-filter', 'value')]
 )
+@callback_cache.memoize()
 def update_charts(selected_facilities):
     # Transient vs Credential Parking by Facility
     facility_data = {
@@ -181,29 +290,24 @@ def update_charts(selected_facilities):
     line_chart_fig.update_layout(yaxis_title='Parking Events')
     
     # Facility Clustering Analysis
-    cluster_data = {
-        'x': [np.random.random() for _ in facility_names],
-        'y': [np.random.random() for _ in facility_names],
-        'z': [np.random.randint(1000, 3000) for _ in facility_names],
-        'name': facility_names
-    }
-    cluster_df = pd.DataFrame(cluster_data)
-    scatter_chart_fig = px.scatter(cluster_df, x='x', y='y', size='z', color='name',
-                                   labels={'x': 'Occupancy Rate', 'y': 'Turnover Rate', 'z': 'Average Daily Usage'},
-                                   title='Facility Clustering Analysis')
+    if facility_clusters is None:
+        scatter_chart_fig = go.Figure()
+        scatter_chart_fig.update_layout(title='Facility Clustering Analysis (run FacilityClustering.py to populate)')
+    else:
+        cluster_df = facility_clusters[facility_clusters['FACILITY_NAME'].isin(selected_facilities)].copy()
+        cluster_df['CLUSTER'] = 'Cluster ' + cluster_df['CLUSTER'].astype(str)
+        scatter_chart_fig = px.scatter(cluster_df, x='PC1', y='PC2', size='AVG_USAGE', color='CLUSTER',
+                                       hover_name='FACILITY_NAME', hover_data={'CLUSTER_SHARE': ':.0%'},
+                                       labels={'PC1': 'Profile Component 1', 'PC2': 'Profile Component 2',
+                                               'AVG_USAGE': 'Average Daily Usage', 'CLUSTER_SHARE': 'Days in Cluster'},
+                                       title=f"Facility Clustering Analysis (k={facility_clusters['K'].iloc[0]})")
     
     # Feature Importance for Parking Prediction
-    feature_importance = [
-        {'feature': 'Time of Day', 'importance': 0.3},
-        {'feature': 'Day of Week', 'importance': 0.25},
-        {'feature': 'Month', 'importance': 0.2},
-        {'feature': 'Special Events', 'importance': 0.15},
-        {'feature': 'Weather', 'importance': 0.1},
-    ]
-    importance_df = pd.DataFrame(feature_importance)
-    importance_chart_fig = px.bar(importance_df, x='importance', y='feature', orientation='h', 
-                                  labels={'importance': 'Importance', 'feature': 'Feature'},
-                                  title='Feature Importance for Parking Prediction')
+    if feature_importance_df is None:
+        importance_chart_fig = go.Figure()
+        importance_chart_fig.update_layout(title='Feature Importance for Parking Prediction (run FeatureImportance.py to populate)')
+    else:
+        importance_chart_fig = importance_figure(feature_importance_df)
 
     # Heatmap of Parking Utilization by Day and Time
     heatmap_data = transactions.groupby(['DAY_OF_WEEK', 'HOUR_OF_DAY']).size().unstack(fill_value=0)
@@ -218,7 +322,7 @@ def update_charts(selected_facilities):
     model_data = transactions.resample('H', on='ENTRY_DATETIME').size().reset_index(name='y')
     model_data.rename(columns={'ENTRY_DATETIME': 'ds'}, inplace=True)
     
-    model = Prophet()
+    model = Prophet(holidays=calendar_holidays)
     model.fit(model_data)
     
     future = model.make_future_dataframe(periods=2*365*24, freq='H')  # Extend for 2 more years (2025-2026)
@@ -238,12 +342,20 @@ def update_charts(selected_facilities):
     # Scatter Plot: Correlation between Rainfall/Snowfall and Parking Occupancy
     scatter_plot_fig = px.scatter(merged_data, x='Rainfall', y='Parking_Count', 
                                   title='Correlation between Rainfall and Parking Occupancy',
-                                  labels={'Rainfall': 'Rainfall (inches)', 'Parking_Count': 'Parking Events'},
-                                  trendline='ols')
+                                  labels={'Rainfall': 'Rainfall (inches)', 'Parking_Count': 'Parking Events'})
     
     scatter_plot_fig.add_trace(go.Scatter(x=merged_data['Snowfall'], y=merged_data['Parking_Count'], 
                                           mode='markers', name='Snowfall', marker=dict(color='rgba(255, 0, 0, 0.5)')))
     
+    # Fitted lines come from the cached regression, so nothing is fit here
+    if weather_regression is not None:
+        for term, color in [('Rainfall', 'blue'), ('Snowfall', 'red')]:
+            fit = weather_fit_line(weather_regression, term, [0, merged_data[term].max()])
+            if fit is not None:
+                x, y, row = fit
+                scatter_plot_fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line=dict(color=color),
+                                                      name=f"{term} fit ({row['COEF']:+,.0f} +/- {1.96 * row['STD_ERR']:,.0f} per inch)"))
+    
     scatter_plot_fig.update_layout(
         yaxis_title='Parking Events',
         xaxis_title='Weather (Rainfall in blue, Snowfall in red)',
@@ -270,6 +382,83 @@ def update_charts(selected_facilities):
 
     return bar_chart_fig, line_chart_fig, scatter_chart_fig, importance_chart_fig, heatmap_chart_fig, heatmap_forecast_fig, scatter_plot_fig, time_series_fig
 
+@app.callback(
+    Output('duration-quantile-chart', 'figure'),
+    [Input('facility-filter', 'value'),
+     Input('duration-quantile', 'value')]
+)
+@callback_cache.memoize()
+def update_duration_quantiles(selected_facilities, quantile):
+    # Merge the selected facilities' sketches and read one percentile per hour-of-week
+    hours = facility_quantiles(duration_sketches, sketch_facilities, selected_facilities, [quantile])[:, 0] / 60
+    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    duration_fig = px.imshow(hours.reshape(7, 24), x=list(range(24)), y=days_order,
+                             labels=dict(x="Hour of Day", y="Day of Week", color="Duration (hours)"),
+                             title=f'p{quantile * 100:g} Parking Duration by Day and Time (through {sketch_watermark})')
+    duration_fig.update_layout(xaxis=dict(tickmode='linear', tick0=0, dtick=1))
+    return duration_fig
+
+@app.callback(
+    Output('anomaly-chart', 'figure'),
+    [Input('facility-filter', 'value')]
+)
+@callback_cache.memoize()
+def update_anomalies(selected_facilities):
+    if anomaly_intervals is None:
+        anomaly_fig = go.Figure()
+        anomaly_fig.update_layout(title='Demand Anomalies by Facility (run AnomalyDetection.py to populate)')
+        return anomaly_fig
+    anomaly_df = anomaly_intervals[anomaly_intervals['FACILITY_NAME'].isin(selected_facilities)].copy()
+    anomaly_df['SEVERITY'] = anomaly_df['PEAK_SCORE'].abs()
+    anomaly_fig = px.scatter(anomaly_df, x='START', y='FACILITY_NAME', size='SEVERITY', color='DIRECTION',
+                             color_discrete_map={'Surge': 'red', 'Drop': 'blue'},
+                             hover_data={'END': True, 'HOURS': True, 'COUNT': True, 'BASELINE': ':.0f', 'SEVERITY': False},
+                             labels={'START': 'Date', 'FACILITY_NAME': 'Facility', 'COUNT': 'Entries', 'BASELINE': 'Expected Entries'},
+                             title='Demand Anomalies by Facility')
+    return anomaly_fig
+
+@app.callback(
+    Output('pricing-chart', 'figure'),
+    [Input('facility-filter', 'value'),
+     Input('price-change', 'value'),
+     Input('price-elasticity', 'value'),
+     Input('pricing-window', 'value')]
+)
+@callback_cache.memoize()
+def update_pricing(selected_facilities, price_change, elasticity, window):
+    if not pricing_facilities:
+        pricing_fig = go.Figure()
+        pricing_fig.update_layout(title='Dynamic Pricing What-If (run DurationSketches.py to populate)')
+        return pricing_fig
+    scenario = {'name': 'What-If', 'price_change': price_change, 'elasticity': elasticity,
+                'peak_only': window == 'peak', 'off_peak_only': window == 'off_peak'}
+    pricing_df = run_scenarios(pricing_facilities, pricing_rates, pricing_dwell, pricing_capacity,
+                               scenarios=[SCENARIOS[0], scenario], n_weeks=PRICING_WEEKS, n_jobs=2)
+    pricing_df = pricing_df[pricing_df['FACILITY_NAME'].isin(selected_facilities)]
+
+    pricing_fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                                subplot_titles=('Probability of a Lot-Full Week', 'Expected Weekly Revenue'))
+    for name, color in [(SCENARIOS[0]['name'], 'gray'), ('What-If', 'orange')]:
+        scenario_df = pricing_df[pricing_df['SCENARIO'] == name]
+        pricing_fig.add_trace(go.Bar(x=scenario_df['FACILITY_NAME'], y=scenario_df['LOT_FULL_WEEK_PROB'],
+                                     name=name, marker_color=color, legendgroup=name), row=1, col=1)
+        pricing_fig.add_trace(go.Bar(x=scenario_df['FACILITY_NAME'], y=scenario_df['WEEKLY_REVENUE'],
+                                     name=name, marker_color=color, legendgroup=name, showlegend=False), row=2, col=1)
+    pricing_fig.update_layout(barmode='group', height=800, title=f'Dynamic Pricing What-If ({price_change:+.0%} price)')
+    pricing_fig.update_yaxes(title_text='Probability', tickformat='.0%', row=1, col=1)
+    pricing_fig.update_yaxes(title_text='Revenue ($)', row=2, col=1)
+    return pricing_fig
+
+# Warm the default views at startup, whether run as a script or imported by a WSGI server;
+# the first worker to claim this data version does it in the background
+if not reloader_watcher(__name__, DEBUG):
+    callback_cache.warm_up([
+        (update_charts, (facility_names,)),
+        (update_duration_quantiles, (facility_names, 0.9)),
+        (update_anomalies, (facility_names,)),
+        (update_pricing, (facility_names, 0.25, -0.3, 'peak')),
+    ])
+
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run_server(debug=DEBUG)
 
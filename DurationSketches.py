@@ -0,0 +1,136 @@
+import os
+import numpy as np
+import pandas as pd
+
+from ParkingCube import CACHE_DIR, CHUNK_SIZE, HOURS_OF_WEEK, TRANSACTIONS_CSV, read_transactions_chunked
+
+# Mergeable streaming quantile sketches of parking duration per facility x hour-of-week.
+# Each sketch is a log-spaced histogram (DDSketch-style): any quantile read from it is
+# within RELATIVE_ACCURACY of the exact value, two sketches merge by adding their counts,
+# and memory is fixed at facilities x 168 x N_BINS however many transactions are ingested.
+
+SKETCH_PATH = os.path.join(CACHE_DIR, 'duration_sketches.npz')
+
+RELATIVE_ACCURACY = 0.01
+MIN_MINUTES = 1.0
+MAX_MINUTES = 60 * 24 * 30
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Bin 0 holds durations up to MIN_MINUTES, the last bin anything beyond MAX_MINUTES
+N_BINS = int(np.ceil(np.log(MAX_MINUTES / MIN_MINUTES) / np.log(GAMMA))) + 2
+BIN_VALUES = np.concatenate([[MIN_MINUTES], MIN_MINUTES * 2 * GAMMA ** np.arange(1, N_BINS) / (GAMMA + 1)])
+
+
+def duration_bins(minutes):
+    scaled = np.maximum(minutes, MIN_MINUTES) / MIN_MINUTES
+    return np.clip(np.ceil(np.log(scaled) / np.log(GAMMA)), 0, N_BINS - 1).astype(np.int64)
+
+
+def empty_sketches(n_facilities=0):
+    return np.zeros((n_facilities, HOURS_OF_WEEK, N_BINS), dtype=np.int32)
+
+
+def sketchable(chunk):
+    # Missing times (including transactions with no exit yet) and exits before entries are
+    # left to the cleaning stage, not sketched
+    minutes = (chunk['EXIT_DATETIME'] - chunk['ENTRY_DATETIME']).dt.total_seconds() / 60
+    return chunk[minutes.notna() & (minutes >= 0)]
+
+
+def add_chunk_to_sketches(sketches, facilities, chunk):
+    # facilities maps FACILITY_NAME -> sketch row and grows as new names appear
+    chunk = sketchable(chunk)
+    minutes = (chunk['EXIT_DATETIME'] - chunk['ENTRY_DATETIME']).dt.total_seconds() / 60
+    for name in chunk['FACILITY_NAME'].unique():
+        facilities.setdefault(name, len(facilities))
+    if sketches.shape[0] < len(facilities):
+        sketches = np.concatenate([sketches, empty_sketches(len(facilities) - sketches.shape[0])])
+
+    fac = chunk['FACILITY_NAME'].map(facilities).to_numpy()
+    how = (chunk['ENTRY_DATETIME'].dt.dayofweek * 24 + chunk['ENTRY_DATETIME'].dt.hour).to_numpy()
+    flat = (fac * HOURS_OF_WEEK + how) * N_BINS + duration_bins(minutes.to_numpy())
+    sketches += np.bincount(flat, minlength=sketches.size).reshape(sketches.shape).astype(sketches.dtype)
+    return sketches
+
+
+def save_sketches(sketches, facility_names, watermark, watermark_uids=(), path=SKETCH_PATH):
+    # The sketches are the only record of what has been ingested, so they are swapped in
+    # whole; a crash mid-write leaves the previous file in place
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez_compressed(f, counts=sketches, facilities=np.array(facility_names),
+                            watermark='' if watermark is None else str(watermark),
+                            watermark_uids=np.array(sorted(watermark_uids), dtype=str))
+    os.replace(path + '.tmp', path)
+
+
+def load_sketches(path=SKETCH_PATH):
+    # Returns (counts, facility_names, watermark); empty sketches if nothing has been ingested yet
+    if not os.path.exists(path):
+        return empty_sketches(), [], None
+    with np.load(path) as data:
+        watermark = str(data['watermark'])
+        return data['counts'], data['facilities'].tolist(), pd.Timestamp(watermark) if watermark else None
+
+
+def load_watermark_uids(path=SKETCH_PATH):
+    # Transactions already sketched whose exit is exactly the watermark
+    if not os.path.exists(path):
+        return set()
+    with np.load(path) as data:
+        return set(data['watermark_uids'].tolist()) if 'watermark_uids' in data.files else set()
+
+
+def ingest_transactions(path=TRANSACTIONS_CSV, sketch_path=SKETCH_PATH, chunksize=CHUNK_SIZE):
+    # Incremental: only transactions that exited after the stored watermark are added,
+    # so re-running against a growing export never counts a row twice. The watermark is the
+    # latest exit actually sketched; rows exiting exactly at it are told apart by UID, so
+    # one that shows up in a later export is still added. A row that first appears with an
+    # exit before the watermark is not.
+    sketches, facility_names, watermark = load_sketches(sketch_path)
+    watermark_uids = load_watermark_uids(sketch_path)
+    facilities = {name: i for i, name in enumerate(facility_names)}
+    latest, latest_uids = watermark, set(watermark_uids)
+    for chunk in read_transactions_chunked(path, chunksize):
+        chunk = sketchable(chunk)
+        uids = chunk['PARKING_TRANSACTION_UID'].astype(str)
+        if watermark is not None:
+            exits = chunk['EXIT_DATETIME']
+            chunk = chunk[(exits > watermark) | ((exits == watermark) & ~uids.isin(watermark_uids))]
+        if chunk.empty:
+            continue
+        sketches = add_chunk_to_sketches(sketches, facilities, chunk)
+        chunk_latest = chunk['EXIT_DATETIME'].max()
+        if latest is None or chunk_latest > latest:
+            latest, latest_uids = chunk_latest, set()
+        if chunk_latest == latest:
+            latest_uids.update(uids[chunk.index][chunk['EXIT_DATETIME'] == latest])
+    save_sketches(sketches, list(facilities), latest, latest_uids, sketch_path)
+    return sketches, list(facilities), latest
+
+
+def sketch_quantiles(sketches, quantiles):
+    # sketches: (..., N_BINS) counts -> (..., len(quantiles)) durations in minutes, NaN where empty
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    cumulative = np.cumsum(sketches, axis=-1)
+    total = cumulative[..., -1:]
+    ranks = quantiles * np.maximum(total - 1, 0)
+    idx = (cumulative[..., None, :] <= ranks[..., :, None]).sum(axis=-1)
+    values = BIN_VALUES[np.minimum(idx, N_BINS - 1)]
+    return np.where(total > 0, values, np.nan)
+
+
+def facility_quantiles(sketches, facility_names, selected, quantiles):
+    # Merge the selected facilities' sketches and return a (168, len(quantiles)) array by hour-of-week
+    rows = [i for i, name in enumerate(facility_names) if name in set(selected)]
+    merged = sketches[rows].sum(axis=0) if rows else empty_sketches(1)[0]
+    return sketch_quantiles(merged, quantiles)
+
+
+if __name__ == '__main__':
+    sketches, facility_names, watermark = ingest_transactions()
+    print(f"Sketches cover {sketches.sum():,} transactions across {len(facility_names)} facilities (through {watermark})")
+    print(f"Sketch memory: {sketches.nbytes / 1e6:.1f} MB")
+
+    summary = pd.DataFrame(sketch_quantiles(sketches.sum(axis=1), [0.5, 0.9, 0.99]) / 60,
+                           index=facility_names, columns=['P50_HOURS', 'P90_HOURS', 'P99_HOURS'])
+    print(summary.round(2).sort_index().to_string())
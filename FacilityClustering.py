@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from joblib import Parallel, delayed
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
+
+from ParkingCube import CACHE_DIR, load_hourly_cube
+from AcademicCalendar import CALENDAR_FEATURES, load_calendar
+
+# Cached outputs read by the dashboard's scatter-chart
+CLUSTERS_PATH = os.path.join(CACHE_DIR, 'facility_clusters.csv')
+K_SELECTION_PATH = os.path.join(CACHE_DIR, 'cluster_k_selection.csv')
+
+# 'day' clusters 24-hour profiles per facility-day, 'week' clusters 168-hour profiles per facility-week
+PROFILE = 'day'
+K_RANGE = range(2, 11)
+BATCH_SIZE = 4096
+# Silhouette is quadratic in the number of vectors, so score on a fixed-size sample
+SILHOUETTE_SAMPLE = 20000
+N_JOBS = -1
+
+
+def build_profiles(cube, profile=PROFILE):
+    # Reshape the facility x hour cube into one row per facility-day (or facility-week)
+    period = 24 if profile == 'day' else 24 * 7
+    n_periods = cube.shape[1] // period
+    blocks = cube[:, :n_periods * period].reshape(cube.shape[0], n_periods, period)
+
+    facility_idx = np.repeat(np.arange(cube.shape[0]), n_periods)
+    period_idx = np.tile(np.arange(n_periods), cube.shape[0])
+    vectors = blocks.reshape(-1, period).astype(np.float64)
+    totals = vectors.sum(axis=1)
+
+    # Closed days carry no profile information
+    active = totals > 0
+    vectors, totals, facility_idx, period_idx = vectors[active], totals[active], facility_idx[active], period_idx[active]
+
+    # Cluster on the shape of the profile plus its overall volume
+    shapes = vectors / totals[:, None]
+    features = np.column_stack([shapes, np.log1p(totals)])
+    return features, facility_idx, period_idx, totals
+
+
+def fit_k(X, k):
+    model = MiniBatchKMeans(n_clusters=k, batch_size=BATCH_SIZE, n_init=3, random_state=42)
+    labels = model.fit_predict(X)
+    silhouette = silhouette_score(X, labels, sample_size=min(SILHOUETTE_SAMPLE, len(X)), random_state=42)
+    return k, model, labels, model.inertia_, silhouette
+
+
+def run_clustering(cube, facility_names, profile=PROFILE, k_range=K_RANGE, n_jobs=N_JOBS):
+    features, facility_idx, period_idx, totals = build_profiles(cube, profile)
+    X = StandardScaler().fit_transform(features)
+
+    # Evaluate every candidate k in parallel and keep the best silhouette
+    results = Parallel(n_jobs=n_jobs)(delayed(fit_k)(X, k) for k in k_range)
+    k_selection = pd.DataFrame([{'K': k, 'INERTIA': inertia, 'SILHOUETTE': silhouette}
+                                for k, _, _, inertia, silhouette in results])
+    best_k, _, labels, _, _ = max(results, key=lambda r: r[4])
+
+    # Share of each cluster's periods that fall on class days (for weeks, the week's first day)
+    day = period_idx * (1 if profile == 'day' else 7)
+    semester = load_calendar(cube.shape[1] // 24 + 1)[day, CALENDAR_FEATURES.index('SEMESTER')]
+    cluster_sizes = np.maximum(np.bincount(labels, minlength=best_k), 1)
+    cluster_semester = np.bincount(labels, weights=semester, minlength=best_k) / cluster_sizes
+
+    # Per-facility summary: dominant cluster, how consistently it is used, and position in PCA space
+    coords = PCA(n_components=2, random_state=42).fit_transform(X)
+    vectors = pd.DataFrame({
+        'FACILITY_NAME': np.asarray(facility_names)[facility_idx],
+        'CLUSTER': labels,
+        'TOTAL': totals,
+        'PC1': coords[:, 0],
+        'PC2': coords[:, 1],
+    })
+    cluster_counts = vectors.groupby(['FACILITY_NAME', 'CLUSTER']).size().unstack(fill_value=0)
+    facility_clusters = vectors.groupby('FACILITY_NAME').agg(
+        PC1=('PC1', 'mean'), PC2=('PC2', 'mean'),
+        AVG_USAGE=('TOTAL', 'mean'), PERIODS=('TOTAL', 'size')
+    )
+    facility_clusters['CLUSTER'] = cluster_counts.idxmax(axis=1)
+    facility_clusters['CLUSTER_SHARE'] = cluster_counts.max(axis=1) / cluster_counts.sum(axis=1)
+    facility_clusters['CLUSTER_SEMESTER_SHARE'] = cluster_semester[facility_clusters['CLUSTER']]
+    facility_clusters = facility_clusters.reset_index()
+    facility_clusters['K'] = best_k
+    facility_clusters['PROFILE'] = profile
+    return facility_clusters, k_selection
+
+
+def save_clustering(facility_clusters, k_selection):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    facility_clusters.to_csv(CLUSTERS_PATH, index=False)
+    k_selection.to_csv(K_SELECTION_PATH, index=False)
+
+
+def load_clustering():
+    # Returns (None, None) until FacilityClustering.py has been run
+    if not (os.path.exists(CLUSTERS_PATH) and os.path.exists(K_SELECTION_PATH)):
+        return None, None
+    return pd.read_csv(CLUSTERS_PATH), pd.read_csv(K_SELECTION_PATH)
+
+
+if __name__ == '__main__':
+    cube, facility_names = load_hourly_cube()
+    facility_clusters, k_selection = run_clustering(cube, facility_names)
+    save_clustering(facility_clusters, k_selection)
+
+    fig = make_subplots(rows=1, cols=2,
+                        subplot_titles=("k Selection", f"Facilities by {PROFILE.title()} Profile Cluster"),
+                        specs=[[{"secondary_y": True}, {"type": "scatter"}]])
+
+    fig.add_trace(go.Scatter(x=k_selection['K'], y=k_selection['SILHOUETTE'], name='Silhouette',
+                             mode='lines+markers'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=k_selection['K'], y=k_selection['INERTIA'], name='Inertia',
+                             mode='lines+markers', line=dict(dash='dot')), row=1, col=1, secondary_y=True)
+
+    for cluster, cluster_data in facility_clusters.groupby('CLUSTER'):
+        fig.add_trace(go.Scatter(
+            x=cluster_data['PC1'],
+            y=cluster_data['PC2'],
+            mode='markers',
+            marker=dict(size=10),
+            name=f'Cluster {cluster}',
+            text=cluster_data['FACILITY_NAME'],
+            customdata=cluster_data[['CLUSTER_SHARE', 'CLUSTER_SEMESTER_SHARE']] * 100,
+            hovertemplate="<b>%{text}</b><br>Days in cluster: %{customdata[0]:.0f}%<br>Cluster days in semester: %{customdata[1]:.0f}%",
+        ), row=1, col=2)
+
+    fig.update_layout(height=600, width=1200, title_text="Facility Clustering on Hourly Profiles")
+    fig.update_xaxes(title_text="k", row=1, col=1)
+    fig.update_xaxes(title_text="Principal Component 1", row=1, col=2)
+    fig.update_yaxes(title_text="Principal Component 2", row=1, col=2)
+    fig.show()
+
+    print(f"Selected k={facility_clusters['K'].iloc[0]} from {len(k_selection)} candidates")
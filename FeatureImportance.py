@@ -0,0 +1,138 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from joblib import Parallel, delayed
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import r2_score
+
+from ParkingCube import CACHE_DIR, CUBE_EPOCH, CUBE_PATH, TRANSACTIONS_CSV, WEATHER_XLSX, load_daily_weather, load_hourly_cube
+
+# Fits a gradient-boosted tree model of hourly entries per facility and measures how much
+# each feature matters by permutation importance: shuffle one feature, re-score, and take
+# the drop in R^2. Permutations run in parallel worker processes. Drops are reported as
+# they are, with their spread over repeats, and flagged unreliable when the model has no
+# held-out skill or a drop is within its own noise.
+
+FEATURE_MATRIX_PATH = os.path.join(CACHE_DIR, 'feature_matrix.npz')
+IMPORTANCE_PATH = os.path.join(CACHE_DIR, 'feature_importance.csv')
+
+FEATURES = ['HOUR', 'DAY_OF_WEEK', 'MONTH', 'RAINFALL', 'SNOWFALL', 'FACILITY']
+FEATURE_LABELS = {
+    'HOUR': 'Time of Day',
+    'DAY_OF_WEEK': 'Day of Week',
+    'MONTH': 'Month',
+    'RAINFALL': 'Rainfall',
+    'SNOWFALL': 'Snowfall',
+    'FACILITY': 'Facility',
+}
+
+# The most recent TEST_FRACTION of hours is held out for scoring
+TEST_FRACTION = 0.2
+MAX_SCORING_ROWS = 100000
+N_REPEATS = 5
+N_JOBS = -1
+
+
+def build_feature_matrix(cube, weather):
+    # One row per facility-hour: calendar terms from the hour index, daily weather by day offset
+    n_facilities, n_hours = cube.shape
+    hours = pd.date_range(CUBE_EPOCH, periods=n_hours, freq='h')
+    day = np.arange(n_hours) // 24
+    calendar = np.column_stack([hours.hour, hours.dayofweek, hours.month, weather[day]])
+    X = np.column_stack([np.tile(calendar, (n_facilities, 1)),
+                         np.repeat(np.arange(n_facilities), n_hours)]).astype(np.float32)
+    y = cube.reshape(-1).astype(np.float32)
+    hour_index = np.tile(np.arange(n_hours), n_facilities)
+    return X, y, hour_index
+
+
+def load_feature_matrix(rebuild=False):
+    # Rebuilt whenever the cube, the transactions it is built from or the weather workbook
+    # is newer than the cached matrix
+    sources = [path for path in [CUBE_PATH, TRANSACTIONS_CSV, WEATHER_XLSX] if os.path.exists(path)]
+    stale = not os.path.exists(FEATURE_MATRIX_PATH) or any(
+        os.path.getmtime(path) > os.path.getmtime(FEATURE_MATRIX_PATH) for path in sources)
+    if rebuild or stale:
+        cube, facility_names = load_hourly_cube()
+        weather = load_daily_weather(-(-cube.shape[1] // 24))
+        X, y, hour_index = build_feature_matrix(cube, weather)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(FEATURE_MATRIX_PATH + '.tmp', 'wb') as f:
+            np.savez(f, X=X, y=y, hour_index=hour_index, facilities=np.array(facility_names))
+        os.replace(FEATURE_MATRIX_PATH + '.tmp', FEATURE_MATRIX_PATH)
+        return X, y, hour_index
+    with np.load(FEATURE_MATRIX_PATH) as data:
+        return data['X'], data['y'], data['hour_index']
+
+
+def permuted_score(model, X, y, column, seed):
+    X = X.copy()
+    X[:, column] = np.random.default_rng(seed).permutation(X[:, column])
+    return r2_score(y, model.predict(X))
+
+
+def permutation_importances(model, X, y, n_repeats=N_REPEATS, n_jobs=N_JOBS):
+    baseline = r2_score(y, model.predict(X))
+    tasks = [(column, seed) for column in range(X.shape[1]) for seed in range(n_repeats)]
+    scores = Parallel(n_jobs=n_jobs)(delayed(permuted_score)(model, X, y, column, seed) for column, seed in tasks)
+    drops = baseline - np.array(scores).reshape(X.shape[1], n_repeats)
+    return baseline, drops.mean(axis=1), drops.std(axis=1)
+
+
+def compute_feature_importance(X, y, hour_index):
+    split = np.quantile(hour_index, 1 - TEST_FRACTION)
+    train, test = hour_index < split, hour_index >= split
+    model = HistGradientBoostingRegressor(categorical_features=[FEATURES.index('FACILITY')], random_state=42)
+    model.fit(X[train], y[train])
+
+    X_test, y_test = X[test], y[test]
+    if len(y_test) > MAX_SCORING_ROWS:
+        sample = np.random.default_rng(42).choice(len(y_test), MAX_SCORING_ROWS, replace=False)
+        X_test, y_test = X_test[sample], y_test[sample]
+    r2, importance, importance_std = permutation_importances(model, X_test, y_test)
+
+    # Raw drops in held-out R^2; shares of a model with no skill would look meaningful
+    return pd.DataFrame({
+        'feature': [FEATURE_LABELS[name] for name in FEATURES],
+        'r2_drop': importance,
+        'r2_drop_std': importance_std,
+        'reliable': (r2 > 0) & (importance > importance_std),
+        'model_r2': r2,
+    }).sort_values('r2_drop', ascending=False)
+
+
+def importance_figure(importance):
+    # Bar per feature with its spread over repeats; unreliable drops are drawn in grey
+    r2 = importance['model_r2'].iloc[0]
+    status = np.where(importance['reliable'], 'Reliable', 'Within noise')
+    fig = px.bar(importance.assign(status=status), x='r2_drop', y='feature', error_x='r2_drop_std', orientation='h',
+                 color='status', color_discrete_map={'Reliable': '#636efa', 'Within noise': 'lightgrey'},
+                 labels={'r2_drop': 'Drop in Held-out R^2 when Shuffled', 'feature': 'Feature', 'status': ''},
+                 title=(f'Feature Importance for Parking Prediction (held-out R^2 {r2:.2f})' if r2 > 0 else
+                        f'Feature Importance for Parking Prediction: unreliable, the model has no held-out skill (R^2 {r2:.2f})'))
+    fig.update_yaxes(categoryorder='array', categoryarray=importance['feature'].tolist()[::-1])
+    return fig
+
+
+def load_feature_importance():
+    # Returns None until FeatureImportance.py has been run (or rerun since the output gained
+    # its reliability flag)
+    if not os.path.exists(IMPORTANCE_PATH):
+        return None
+    importance = pd.read_csv(IMPORTANCE_PATH)
+    return importance if 'reliable' in importance else None
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    X, y, hour_index = load_feature_matrix()
+    importance = compute_feature_importance(X, y, hour_index)
+    elapsed = time.perf_counter() - start
+
+    importance.to_csv(IMPORTANCE_PATH, index=False)
+    print(f"Feature importance from {len(y):,} facility-hours in {elapsed:.1f}s (held-out R^2 {importance['model_r2'].iloc[0]:.2f})")
+    print(importance.to_string(index=False))
+
+    importance_figure(importance).show()
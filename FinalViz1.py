@@ -2,24 +2,26 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from SessionReconstruction import reconstruct_sessions
+
 # Load the T2 Warehouse EntryExit Incident data
 t2_data = pd.read_csv('C:/Users/Patron/Downloads/T2_Warehouse_EntryExitIncident_cleaned.csv')
 
-# Convert DATE column to datetime
+# Convert DATE and TIME columns to datetime
+t2_data['DATETIME'] = pd.to_datetime(t2_data['DATE'] + ' ' + t2_data['TIME'], errors='coerce')
 t2_data['DATE'] = pd.to_datetime(t2_data['DATE'])
 
 # Get date range
 start_date = t2_data['DATE'].min().strftime('%Y-%m-%d')
 end_date = t2_data['DATE'].max().strftime('%Y-%m-%d')
 
-# Group the data by 'FACILITY_NAME' and 'PARKING_TYPE'
-grouped_data = t2_data.groupby(['FACILITY_NAME', 'PARKING_TYPE']).size().unstack(fill_value=0)
-
-# Combine Entry and Exit for each type
-grouped_data['Credential'] = grouped_data['Valid Credential Entry'] + grouped_data['Valid Credential Exit']
-grouped_data['Transient'] = grouped_data['Valid Transient Entry'] + grouped_data['Valid Transient Exit']
+# Pair entry and exit events into visits so each visit is counted once
+sessions, unmatched = reconstruct_sessions(t2_data)
+grouped_data = sessions.groupby(['FACILITY_NAME', 'CREDENTIAL_TYPE'], observed=True).size().unstack(fill_value=0)
+grouped_data = grouped_data.reindex(columns=['Credential', 'Transient'], fill_value=0)
+median_dwell = sessions.groupby('CREDENTIAL_TYPE', observed=True)['DURATION_MINUTES'].median()
 
-# Calculate total events and sort
+# Calculate total visits and sort
 grouped_data['Total'] = grouped_data['Credential'] + grouped_data['Transient']
 grouped_data = grouped_data.sort_values('Total', ascending=True)
 
@@ -59,14 +61,18 @@ fig.add_trace(go.Table(
                 fill_color='paleturquoise',
                 align='left'),
     cells=dict(values=[
-        ['Date Range', 'Total Events', 'Credential Events', 'Transient Events', 'Credential %', 'Transient %',
-         'Busiest Facility', 'Avg Events per Facility'],
+        ['Date Range', 'Total Visits', 'Credential Visits', 'Transient Visits', 'Credential %', 'Transient %',
+         'Median Credential Dwell', 'Median Transient Dwell', 'Unmatched Entries / Exits',
+         'Busiest Facility', 'Avg Visits per Facility'],
         [f"{start_date} to {end_date}",
          f"{grouped_data['Total'].sum():,}",
          f"{grouped_data['Credential'].sum():,}",
          f"{grouped_data['Transient'].sum():,}",
          f"{grouped_data['Credential'].sum() / grouped_data['Total'].sum():.1%}",
          f"{grouped_data['Transient'].sum() / grouped_data['Total'].sum():.1%}",
+         f"{median_dwell.get('Credential', 0):,.0f} min",
+         f"{median_dwell.get('Transient', 0):,.0f} min",
+         f"{(unmatched['REASON'] == 'ENTRY_WITHOUT_EXIT').sum():,} / {(unmatched['REASON'] == 'EXIT_WITHOUT_ENTRY').sum():,}",
          f"{grouped_data.index[-1]} ({grouped_data['Total'].max():,})",
          f"{grouped_data['Total'].mean():,.0f}"]
     ],
@@ -75,12 +81,12 @@ fig.add_trace(go.Table(
 
 # Add observations table
 observations = [
-    f"The data covers parking events from {start_date} to {end_date}.",
-    f"The busiest facility ({grouped_data.index[-1]}) handles over {grouped_data['Total'].max():,} parking events.",
+    f"The data covers parking visits from {start_date} to {end_date}; each visit pairs a gate entry with its exit, so visits are not double counted.",
+    f"The busiest facility ({grouped_data.index[-1]}) handles over {grouped_data['Total'].max():,} parking visits.",
     f"Overall, there's a slight preference for credential parking ({grouped_data['Credential'].sum() / grouped_data['Total'].sum():.1%}) over transient parking ({grouped_data['Transient'].sum() / grouped_data['Total'].sum():.1%}).",
-    "The distribution of parking events across facilities is highly uneven, with a few facilities handling a majority of the events.",
+    "The distribution of parking visits across facilities is highly uneven, with a few facilities handling a majority of the events.",
     "Some facilities show a clear preference for either credential or transient parking, while others have a more balanced mix.",
-    f"The average number of events per facility is about {grouped_data['Total'].mean():,.0f}, but this is skewed by the high variability between facilities."
+    f"The average number of visits per facility is about {grouped_data['Total'].mean():,.0f}, but this is skewed by the high variability between facilities."
 ]
 
 fig.add_trace(go.Table(
@@ -103,7 +109,7 @@ fig.update_layout(
     barmode='stack',
     height=1400,
     width=1200,
-    xaxis=dict(title='Number of Parking Events'),
+    xaxis=dict(title='Number of Parking Visits'),
     yaxis=dict(title='Facility Name'),
     legend=dict(x=0.85, y=1.0),
     hovermode='closest'
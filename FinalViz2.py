@@ -5,8 +5,10 @@ import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 
+from ParkingCube import TRANSACTIONS_CSV
+
 # Load the Parking Transactions data
-transactions = pd.read_csv('Parking Transactions from 2023-01-01.csv')
+transactions = pd.read_csv(TRANSACTIONS_CSV)
 
 # Convert date columns to datetime
 transactions['ENTRY_DATETIME'] = pd.to_datetime(transactions['ENTRY_DATE_ONLY'] + ' ' + transactions['ENTRY_TIME_ONLY'])
@@ -4,16 +4,28 @@ import plotly.express as px
 from dash import Dash, dcc, html, Input, Output
 from prophet import Prophet
 
+from ParkingCube import TRANSACTIONS_CSV
+from AcademicCalendar import calendar_version, prophet_holidays
+from CallbackCache import CallbackCache, data_version, reloader_watcher
+
 # Load transactions data (assuming this file exists)
-transactions = pd.read_csv('Parking Transactions from 2023-01-01.csv')
+transactions = pd.read_csv(TRANSACTIONS_CSV)
 
 # Data Preparation
 transactions['ENTRY_DATETIME'] = pd.to_datetime(transactions['ENTRY_DATE_ONLY'] + ' ' + transactions['ENTRY_TIME_ONLY'])
 transactions['DAY_OF_WEEK'] = transactions['ENTRY_DATETIME'].dt.day_name()
 transactions['HOUR_OF_DAY'] = transactions['ENTRY_DATETIME'].dt.hour
 
+# Finals, breaks, holidays and home games as Prophet holidays for the forecast
+calendar_holidays = prophet_holidays()
+
+# Callback results shared across workers; the version changes whenever the input data does
+callback_cache = CallbackCache(data_version([TRANSACTIONS_CSV]) + calendar_version())
+
 # Initialize Dash app
+DEBUG = True
 app = Dash(__name__)
+callback_cache.register_stats_route(app)
 
 app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px'}, children=[
     html.H1('Parking Facility Heatmap Analysis Dashboard'),
@@ -42,8 +54,9 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
 @app.callback(
     [Output('heatmap-chart', 'figure'),
      Output('heatmap-forecast-chart', 'figure')],
-    [Input('heatmap-chart', 'id')]  # Dummy input to trigger the callback
+    [Input('heatmap-chart', 'id')]  # Fires on every page load; repeat loads are served from the cache
 )
+@callback_cache.memoize('FinalViz3A.update_charts')
 def update_charts(_):
     # Heatmap of Parking Utilization by Day and Time
     heatmap_data = transactions.groupby(['DAY_OF_WEEK', 'HOUR_OF_DAY']).size().unstack(fill_value=0)
@@ -58,7 +71,7 @@ def update_charts(_):
     model_data = transactions.resample('h', on='ENTRY_DATETIME').size().reset_index(name='y')
     model_data.rename(columns={'ENTRY_DATETIME': 'ds'}, inplace=True)
     
-    model = Prophet()
+    model = Prophet(holidays=calendar_holidays)
     model.fit(model_data)
     
     future = model.make_future_dataframe(periods=2*365*24, freq='h')  # Extend for 2 more years (2025-2026)
@@ -82,5 +95,10 @@ def update_charts(_):
 
     return heatmap_chart_fig, heatmap_forecast_fig
 
+# Warm the page-load view at startup, whether run as a script or imported by a WSGI server;
+# the first worker to claim this data version does it in the background
+if not reloader_watcher(__name__, DEBUG):
+    callback_cache.warm_up([(update_charts, ('heatmap-chart',))])
+
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    app.run_server(debug=DEBUG)
\ No newline at end of file
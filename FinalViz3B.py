@@ -1,8 +1,10 @@
 import pandas as pd
 import plotly.graph_objects as go
 
+from ParkingCube import TRANSACTIONS_CSV
+
 # Load the Parking Transactions data
-transactions = pd.read_csv('Parking Transactions from 2023-01-01.csv')
+transactions = pd.read_csv(TRANSACTIONS_CSV)
 
 # Convert ENTRY_DATE_ONLY and ENTRY_TIME_ONLY to datetime
 transactions['ENTRY_DATETIME'] = pd.to_datetime(transactions['ENTRY_DATE_ONLY'] + ' ' + transactions['ENTRY_TIME_ONLY'])
@@ -4,8 +4,11 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from scipy import stats
 
+from ParkingCube import CUBE_EPOCH
+from AcademicCalendar import CALENDAR_FEATURES, load_calendar
+
 # Load datasets
-parking_data = pd.read_csv(r"C:\Users\Patron\Downloads\Parking Transactions from 2023-01-01.csv")
+parking_data = pd.read_csv(r"C:\Users\Patron\Downloads\Parking Transactions from 2023-01-01_cleaned.csv")
 rainfall_data = pd.read_csv(r"C:\Users\Patron\Downloads\allwi-r-cleaned.csv")
 snowfall_data = pd.read_csv(r"C:\Users\Patron\Downloads\allwi-snow_year-cleaned.csv")
 
@@ -41,9 +44,19 @@ def prepare_weather_data(weather_data, value_column):
 rainfall_monthly = prepare_weather_data(rainfall_data, 'RAINFALL')
 snowfall_monthly = prepare_weather_data(snowfall_data, 'SNOWFALL')
 
+# Class and finals days per month from the academic calendar feature store
+calendar = load_calendar()
+calendar_dates = CUBE_EPOCH + pd.to_timedelta(np.arange(len(calendar)), unit='D')
+monthly_calendar = pd.DataFrame({
+    'YEAR': calendar_dates.year,
+    'MONTH': calendar_dates.month,
+    'CLASS_DAYS': calendar[:, CALENDAR_FEATURES.index('SEMESTER')] + calendar[:, CALENDAR_FEATURES.index('FINALS')],
+}).groupby(['YEAR', 'MONTH'], as_index=False).sum()
+
 # Merge all data
 merged_data = pd.merge(monthly_parking, rainfall_monthly, on=['YEAR', 'MONTH'])
 merged_data = pd.merge(merged_data, snowfall_monthly, on=['YEAR', 'MONTH'])
+merged_data = pd.merge(merged_data, monthly_calendar, on=['YEAR', 'MONTH'])
 
 # Data quality information
 total_rows = len(merged_data)
@@ -57,6 +70,7 @@ merged_data['SNOWFALL'] = merged_data['SNOWFALL'].fillna(merged_data['SNOWFALL']
 # Calculate correlations
 corr_rainfall = stats.pearsonr(merged_data['RAINFALL'], merged_data['PARKING_EVENTS'])[0]
 corr_snowfall = stats.pearsonr(merged_data['SNOWFALL'], merged_data['PARKING_EVENTS'])[0]
+corr_class_days = stats.pearsonr(merged_data['CLASS_DAYS'], merged_data['PARKING_EVENTS'])[0]
 
 # Create the figure with subplots
 fig = make_subplots(rows=2, cols=1, 
@@ -99,7 +113,7 @@ fig.add_trace(
 
 # Add text annotations for key insights
 fig.add_annotation(
-    text=f"Rainfall Correlation: {corr_rainfall:.2f}<br>Snowfall Correlation: {corr_snowfall:.2f}",
+    text=f"Rainfall Correlation: {corr_rainfall:.2f}<br>Snowfall Correlation: {corr_snowfall:.2f}<br>Class Days Correlation: {corr_class_days:.2f}",
     xref="paper", yref="paper",
     x=0.01, y=0.99,
     showarrow=False,
@@ -114,10 +128,11 @@ analysis_details = [
     ["Snowfall", f"Range: {merged_data['SNOWFALL'].min():.2f} to {merged_data['SNOWFALL'].max():.2f} inches per month<br>Mean: {merged_data['SNOWFALL'].mean():.2f} inches<br>Median: {merged_data['SNOWFALL'].median():.2f} inches"],
     ["Data Quality", f"Rainfall: {nan_rainfall} NaN values out of {total_rows} entries<br>Snowfall: {nan_snowfall} NaN values out of {total_rows} entries<br>NaN values were replaced with column means. Trace amounts (T) were set to 0.01 inches."],
     ["Correlations", f"Rainfall-Parking: {corr_rainfall:.2f} (Very weak positive correlation)<br>Snowfall-Parking: {corr_snowfall:.2f} (Moderate negative correlation)"],
+    ["Academic Calendar", f"Class and finals days per month: {merged_data['CLASS_DAYS'].min()} to {merged_data['CLASS_DAYS'].max()}<br>Class Days-Parking correlation: {corr_class_days:.2f}"],
     ["Methodology", "1. Aggregated daily parking data to monthly level<br>2. Merged with monthly rainfall and snowfall data<br>3. Cleaned and preprocessed weather data<br>4. Calculated Pearson correlations<br>5. Visualized relationships over time"],
     ["Key Observations", "1. Parking events show significant monthly variation<br>2. Rainfall has minimal impact on parking patterns<br>3. Snowfall shows a moderate negative correlation with parking events<br>4. Winter months generally see decreased parking activity<br>5. Peak parking months don't align consistently with weather patterns"],
     ["Insights", "1. The weak correlation (0.00) between rainfall and parking suggests rain has little influence on parking behavior<br>2. The moderate negative correlation (-0.52) between snowfall and parking indicates snow discourages parking, possibly due to reduced travel or campus closures<br>3. The wide range in monthly parking events (164,944 to 309,375) suggests strong influence from factors other than weather, such as academic calendar or local events<br>4. Snowfall's larger impact compared to rainfall might be due to its more disruptive nature and concentration in winter months"],
-    ["Limitations", "1. Monthly aggregation may obscure daily or weekly weather impacts<br>2. Other factors (e.g., academic schedule, events) are not accounted for<br>3. Data quality issues in snowfall data may affect accuracy of correlations<br>4. Limited dataset (18 months) may not capture long-term trends or anomalies"],
+    ["Limitations", "1. Monthly aggregation may obscure daily or weekly weather impacts<br>2. Local events and home games are not accounted for beyond the academic calendar correlation<br>3. Data quality issues in snowfall data may affect accuracy of correlations<br>4. Limited dataset (18 months) may not capture long-term trends or anomalies"],
     ["Recommendations", "1. Conduct daily-level analysis to capture immediate weather impacts<br>2. Incorporate additional variables like academic calendar, local events, and day of week<br>3. Extend the study period to capture long-term trends and seasonal patterns<br>4. Investigate the reasons for the significant variation in monthly parking events<br>5. Consider separate analyses for different seasons or academic periods"]
 ]
 
@@ -0,0 +1,205 @@
+import csv
+import os
+import socket
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import Dash, dcc, html, Input, Output, State, Patch
+
+# Live mode: tails an append-only gate event feed (a growing CSV file, or lines sent to a
+# local socket standing in for the gate system) and keeps per-facility occupancy and the
+# day x hour entry heatmap current in O(1) per event. The Dash app polls on a dcc.Interval
+# and receives only the cells that changed since its last poll, applied with Patch.
+
+# Feed lines use the T2 export columns: FACILITY_NAME,PARKING_TYPE,DATE,TIME
+FEED_PATH = 'live_gate_events.csv'
+FEED_HOST = '127.0.0.1'
+FEED_PORT = 9750
+LIVE_SOURCE = 'file'  # or 'socket'
+POLL_SECONDS = 0.2
+REFRESH_MS = 2000
+
+days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+@lru_cache(maxsize=4096)
+def day_of_week(date):
+    # Feed dates repeat for a whole day of events, so each one is parsed once
+    return pd.Timestamp(date).dayofweek
+
+
+class LiveCounters:
+    # Every update stamps the cell it touched with a sequence number, so any client can ask
+    # for just the cells that changed since the sequence number it last saw.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.facilities = {}
+        self.occupancy = []
+        self.occupancy_seq = []
+        self.heatmap = np.zeros((7, 24), dtype=np.int64)
+        self.heatmap_seq = np.zeros((7, 24), dtype=np.int64)
+        self.events = 0
+        self.rejected = 0
+
+    def apply(self, facility, parking_type, date, time_of_day):
+        if parking_type.endswith('Entry'):
+            change = 1
+        elif parking_type.endswith('Exit'):
+            change = -1
+        else:
+            return
+        # Validate everything before touching any counter, so a bad line changes nothing
+        hour = int(time_of_day.split(':', 1)[0])
+        if not 0 <= hour < 24:
+            raise ValueError(f"hour out of range: {time_of_day}")
+        day = day_of_week(date)
+        # An empty or 'NaT' date parses to NaT, whose day of week is NaN
+        if pd.isna(day):
+            raise ValueError(f"missing date: {date!r}")
+        with self.lock:
+            self.seq += 1
+            self.events += 1
+            index = self.facilities.get(facility)
+            if index is None:
+                index = self.facilities[facility] = len(self.occupancy)
+                self.occupancy.append(0)
+                self.occupancy_seq.append(0)
+            self.occupancy[index] += change
+            self.occupancy_seq[index] = self.seq
+            if change > 0:
+                self.heatmap[day, hour] += 1
+                self.heatmap_seq[day, hour] = self.seq
+
+    def apply_line(self, line):
+        try:
+            facility, parking_type, date, time_of_day = next(csv.reader([line]))[:4]
+            if facility == 'FACILITY_NAME':
+                return
+            self.apply(facility, parking_type, date, time_of_day)
+        except (ValueError, StopIteration):
+            with self.lock:
+                self.rejected += 1
+
+    def changes_since(self, seq):
+        # Compact delta: {facility index: occupancy} and [(day, hour, count)] changed after seq
+        with self.lock:
+            occupancy = {i: value for i, (value, stamp) in enumerate(zip(self.occupancy, self.occupancy_seq)) if stamp > seq}
+            days, hours = np.nonzero(self.heatmap_seq > seq)
+            cells = [(int(d), int(h), int(self.heatmap[d, h])) for d, h in zip(days, hours)]
+            return {'seq': self.seq, 'facilities': list(self.facilities), 'occupancy': occupancy, 'heatmap': cells}
+
+
+def tail_file(counters, path=FEED_PATH, from_start=False, stop=None):
+    # Follow an append-only file like `tail -f`, holding back any partial last line
+    while not os.path.exists(path):
+        time.sleep(POLL_SECONDS)
+    feed = open(path, 'r', newline='')
+    if not from_start:
+        feed.seek(0, os.SEEK_END)
+    pending = ''
+    while stop is None or not stop.is_set():
+        chunk = feed.readline()
+        if not chunk:
+            # Start over if the feed was truncated or rotated
+            if os.path.getsize(path) < feed.tell():
+                feed.close()
+                feed = open(path, 'r', newline='')
+                pending = ''
+            time.sleep(POLL_SECONDS)
+            continue
+        pending += chunk
+        if pending.endswith('\n'):
+            counters.apply_line(pending.rstrip('\r\n'))
+            pending = ''
+    feed.close()
+
+
+def serve_socket(counters, host=FEED_HOST, port=FEED_PORT, stop=None):
+    # Accept newline-delimited events from local senders, one connection at a time
+    with socket.create_server((host, port)) as server:
+        server.settimeout(POLL_SECONDS)
+        while stop is None or not stop.is_set():
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            with connection, connection.makefile('r', newline='') as lines:
+                for line in lines:
+                    counters.apply_line(line.rstrip('\r\n'))
+
+
+def replay_events(source_csv, path=FEED_PATH, events_per_second=1000):
+    # Stand-in for the gate system: append a historical export to the feed at a fixed rate
+    events = pd.read_csv(source_csv, usecols=['FACILITY_NAME', 'PARKING_TYPE', 'DATE', 'TIME'])
+    batch = max(1, events_per_second // 10)
+    with open(path, 'a', newline='') as feed:
+        for start in range(0, len(events), batch):
+            events.iloc[start:start + batch].to_csv(feed, header=False, index=False)
+            feed.flush()
+            time.sleep(batch / events_per_second)
+
+
+def create_app(counters):
+    app = Dash(__name__)
+
+    heatmap_fig = go.Figure(go.Heatmap(z=counters.heatmap.tolist(), x=list(range(24)), y=days_order,
+                                       colorscale='Viridis', colorbar=dict(title='Entries')))
+    heatmap_fig.update_layout(title='Live Entries by Day and Time', xaxis=dict(title='Hour of Day', dtick=1),
+                              yaxis=dict(title='Day of Week', autorange='reversed'))
+    occupancy_fig = go.Figure(go.Bar(x=[], y=[], orientation='h', marker_color='blue'))
+    occupancy_fig.update_layout(title='Live Occupancy by Facility', xaxis_title='Vehicles Parked',
+                                yaxis_title='Facility', height=700)
+
+    app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px'}, children=[
+        html.H1('Live Parking Gate Feed'),
+        html.P(id='live-status'),
+        dcc.Graph(id='live-occupancy-chart', figure=occupancy_fig),
+        dcc.Graph(id='live-heatmap-chart', figure=heatmap_fig),
+        dcc.Interval(id='live-interval', interval=REFRESH_MS),
+        # What this browser tab has already drawn: last sequence number and facility count
+        dcc.Store(id='live-seen', data={'seq': 0, 'facilities': 0}),
+    ])
+
+    @app.callback(
+        [Output('live-occupancy-chart', 'figure'),
+         Output('live-heatmap-chart', 'figure'),
+         Output('live-status', 'children'),
+         Output('live-seen', 'data')],
+        [Input('live-interval', 'n_intervals')],
+        [State('live-seen', 'data')]
+    )
+    def update_live(_, seen):
+        delta = counters.changes_since(seen['seq'])
+
+        occupancy_patch = Patch()
+        for index, value in delta['occupancy'].items():
+            if index < seen['facilities']:
+                occupancy_patch['data'][0]['x'][index] = value
+        for index in range(seen['facilities'], len(delta['facilities'])):
+            occupancy_patch['data'][0]['y'].append(delta['facilities'][index])
+            occupancy_patch['data'][0]['x'].append(delta['occupancy'].get(index, 0))
+
+        heatmap_patch = Patch()
+        for day, hour, value in delta['heatmap']:
+            heatmap_patch['data'][0]['z'][day][hour] = value
+
+        status = f"{counters.events:,} events applied, {counters.rejected:,} rejected, {len(delta['heatmap'])} heatmap cells updated"
+        return occupancy_patch, heatmap_patch, status, {'seq': delta['seq'], 'facilities': len(delta['facilities'])}
+
+    return app
+
+
+if __name__ == '__main__':
+    counters = LiveCounters()
+    feed = serve_socket if LIVE_SOURCE == 'socket' else tail_file
+    threading.Thread(target=feed, args=(counters,), daemon=True).start()
+
+    app = create_app(counters)
+    # The debug reloader would start a second feed reader, so run without it
+    app.run(debug=False)
@@ -0,0 +1,115 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from ParkingCube import CACHE_DIR, CUBE_EPOCH, TRANSACTIONS_CSV, facility_key, read_transactions_chunked
+
+# Attaches to every lot-full incident the facility's arrivals, departures and occupancy
+# over the preceding WINDOW_MINUTES, so we can study what leads up to a full lot.
+
+LOT_FULL_CSV = 'LotFullIncidents_cleaned.csv'
+CONTEXT_PATH = os.path.join(CACHE_DIR, 'lot_full_context.csv')
+WINDOW_MINUTES = 60
+
+# Per-facility times are packed into one sorted int64 key: facility code in the high bits,
+# seconds since CUBE_EPOCH in the low bits. One searchsorted then answers every
+# (facility, time) lookup for all incidents at once.
+FACILITY_SHIFT = 40
+TIME_OFFSET = 1 << 36
+
+
+def packed_times(codes, datetimes):
+    seconds = (datetimes - CUBE_EPOCH) // pd.Timedelta(seconds=1)
+    return (np.asarray(codes, dtype=np.int64) << FACILITY_SHIFT) + np.asarray(seconds, dtype=np.int64) + TIME_OFFSET
+
+
+def build_facility_timelines(path=TRANSACTIONS_CSV):
+    # Sorted packed times for every facility, read with the chunked loader: all entries (for
+    # arrivals), entries of transactions with a recorded exit, and those exits. Occupancy only
+    # uses the closed transactions, so a missing exit (gate fault, lost ticket, still parked at
+    # export time) does not count as parked forever.
+    keys = {}
+    entries, closed_entries, exits = [], [], []
+    for chunk in read_transactions_chunked(path):
+        names = pd.Series(chunk['FACILITY_NAME'].unique())
+        for key in names.map(facility_key).unique():
+            keys.setdefault(key, len(keys))
+        codes = chunk['FACILITY_NAME'].map(dict(zip(names, names.map(facility_key).map(keys)))).to_numpy()
+        has_entry = chunk['ENTRY_DATETIME'].notna().to_numpy()
+        has_exit = has_entry & chunk['EXIT_DATETIME'].notna().to_numpy()
+        entries.append(packed_times(codes[has_entry], chunk['ENTRY_DATETIME'][has_entry]))
+        closed_entries.append(packed_times(codes[has_exit], chunk['ENTRY_DATETIME'][has_exit]))
+        exits.append(packed_times(codes[has_exit], chunk['EXIT_DATETIME'][has_exit]))
+    entries, closed_entries, exits = (np.sort(np.concatenate(times)) if times else np.zeros(0, dtype=np.int64)
+                                      for times in (entries, closed_entries, exits))
+    return entries, closed_entries, exits, keys
+
+
+def load_lot_full(path=LOT_FULL_CSV):
+    lot_full = pd.read_csv(path)
+    lot_full['DATETIME'] = pd.to_datetime(lot_full['Date'] + ' ' + lot_full['Time'], errors='coerce')
+    return lot_full
+
+
+def attach_context(lot_full, entries, closed_entries, exits, keys, window_minutes=WINDOW_MINUTES):
+    lot_full = lot_full.copy()
+    lot_full['FACILITY_KEY'] = lot_full['FAC_DESCRIPTION'].map(facility_key)
+    codes = lot_full['FACILITY_KEY'].map(keys)
+    matched = (codes.notna() & lot_full['DATETIME'].notna()).to_numpy()
+
+    at = packed_times(codes[matched], lot_full.loc[matched, 'DATETIME'])
+    start = at - window_minutes * 60
+
+    # Counts of events at or before each instant, all incidents in one pass
+    entries_at = np.searchsorted(entries, at, side='right')
+    entries_start = np.searchsorted(entries, start, side='right')
+    closed_at = np.searchsorted(closed_entries, at, side='right')
+    closed_start = np.searchsorted(closed_entries, start, side='right')
+    exits_at = np.searchsorted(exits, at, side='right')
+    exits_start = np.searchsorted(exits, start, side='right')
+    # Events of lower-numbered facilities sort before this facility's, so subtract them out
+    first = codes[matched].to_numpy(dtype=np.int64) << FACILITY_SHIFT
+    entries_base = np.searchsorted(entries, first, side='left')
+    closed_base = np.searchsorted(closed_entries, first, side='left')
+    exits_base = np.searchsorted(exits, first, side='left')
+
+    context = {
+        'ARRIVALS': entries_at - entries_start,
+        'DEPARTURES': exits_at - exits_start,
+        'OCCUPANCY_AT_WINDOW_START': (closed_start - closed_base) - (exits_start - exits_base),
+        'OCCUPANCY_AT_INCIDENT': (closed_at - closed_base) - (exits_at - exits_base),
+        # Entries up to the incident with no exit on record, left out of occupancy
+        'OPEN_TRANSACTIONS': (entries_at - entries_base) - (closed_at - closed_base),
+    }
+    for column, values in context.items():
+        lot_full[column] = np.nan
+        lot_full.loc[matched, column] = values
+    lot_full['ARRIVAL_RATE_PER_HOUR'] = lot_full['ARRIVALS'] * 60 / window_minutes
+    lot_full['NET_INFLOW'] = lot_full['ARRIVALS'] - lot_full['DEPARTURES']
+    lot_full['WINDOW_MINUTES'] = window_minutes
+    return lot_full
+
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    entries, closed_entries, exits, keys = build_facility_timelines()
+    lot_full = load_lot_full()
+    context = attach_context(lot_full, entries, closed_entries, exits, keys)
+    elapsed = time.perf_counter() - start_time
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    context.to_csv(CONTEXT_PATH, index=False)
+
+    unmatched = context.loc[context['ARRIVALS'].isna(), 'FAC_DESCRIPTION'].unique()
+    print(f"Joined {len(context):,} lot-full incidents against {len(entries):,} entries in {elapsed:.1f}s")
+    if len(unmatched):
+        print(f"No transactions found for: {', '.join(map(str, unmatched))}")
+
+    fig = px.box(context.dropna(subset=['ARRIVALS']), x='FAC_DESCRIPTION', y='ARRIVAL_RATE_PER_HOUR',
+                 hover_data=['OCCUPANCY_AT_INCIDENT', 'NET_INFLOW'],
+                 labels={'FAC_DESCRIPTION': 'Facility', 'ARRIVAL_RATE_PER_HOUR': 'Arrivals per Hour'},
+                 title=f'Arrival Rate in the {WINDOW_MINUTES} Minutes Before Each Lot-Full Incident')
+    fig.update_layout(height=700, width=1200)
+    fig.show()
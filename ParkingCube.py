@@ -0,0 +1,136 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Shared loader for the parking transactions export and the hourly count cube
+# (facility x hour-since-epoch entry counts) that the analysis stages build on.
+
+# The raw export is validated by CleanT2Exports.py; everything downstream reads the cleaned file
+TRANSACTIONS_RAW_CSV = 'Parking Transactions from 2023-01-01.csv'
+TRANSACTIONS_CSV = 'Parking Transactions from 2023-01-01_cleaned.csv'
+WEATHER_XLSX = r'C:\Users\Patron\Downloads\weather_data_2023_2024.xlsx'
+CACHE_DIR = 'cache'
+CUBE_PATH = os.path.join(CACHE_DIR, 'hourly_count_cube.npz')
+
+# Hour 0 of the cube; the export starts on this date
+CUBE_EPOCH = pd.Timestamp('2023-01-01')
+CHUNK_SIZE = 1_000_000
+HOURS_OF_WEEK = 24 * 7
+
+KNOWN_FACILITIES = [
+    '076  UNIV BAY DRIVE RAMP', '067  LINDEN DRIVE RAMP', '080  UNION SOUTH GARAGE',
+    '046  LAKE & JOHNSON RAMP', '006U HC WHITE GARAGE UPPR', '007  GRAINGER HALL GARAGE',
+    '075  UW HOSPITAL RAMP', '020  UNIVERSITY AVE RAMP', '017 ENGINEERING DR RAMP',
+    '036  OBSERVATORY DR RAMP', '038  MICROBIAL SCI GARAGE', '029  N PARK STREET RAMP',
+    '027  NANCY NICHOLAS HALL GARAGE', '083  FLUNO CENTER GARAGE', '023  VAN HISE GARAGE',
+    '095  HEALTH SCI GARAGE', '006L HC WHITE GARAGE LOWR', '075V UW Hospital Valet',
+    '063 CHILDRENS HOSP GARAGE'
+]
+
+TRANSACTION_COLUMNS = ['PARKING_TRANSACTION_UID', 'FACILITY_NAME',
+                       'ENTRY_DATE_ONLY', 'ENTRY_TIME_ONLY',
+                       'EXIT_DATE_ONLY', 'EXIT_TIME_ONLY']
+
+
+def facility_key(name):
+    # FACILITY_NAME ('076  UNIV BAY DRIVE RAMP') and FAC_DESCRIPTION differ in spacing and
+    # case; match on the lot number when there is one, else on the cleaned-up name
+    name = re.sub(r'\s+', ' ', str(name)).strip().upper()
+    code = re.match(r'^(\d{3}[A-Z]?)\b', name)
+    return code.group(1) if code else name
+
+
+def read_transactions_chunked(path=TRANSACTIONS_CSV, chunksize=CHUNK_SIZE):
+    # Stream the export in fixed-size chunks so memory stays flat however long the history is
+    # Dates and times as text: a chunk of open transactions has an all-empty exit, which
+    # read_csv would otherwise read as float and fail to concatenate
+    text_columns = dict.fromkeys(TRANSACTION_COLUMNS[2:], str)
+    for chunk in pd.read_csv(path, usecols=TRANSACTION_COLUMNS, dtype=text_columns, chunksize=chunksize):
+        chunk['ENTRY_DATETIME'] = pd.to_datetime(chunk['ENTRY_DATE_ONLY'] + ' ' + chunk['ENTRY_TIME_ONLY'], errors='coerce')
+        chunk['EXIT_DATETIME'] = pd.to_datetime(chunk['EXIT_DATE_ONLY'] + ' ' + chunk['EXIT_TIME_ONLY'], errors='coerce')
+        yield chunk
+
+
+def hours_since_epoch(datetimes):
+    return ((datetimes - CUBE_EPOCH) // pd.Timedelta(hours=1)).to_numpy()
+
+
+def add_chunk_to_cube(cube, facilities, chunk):
+    # facilities maps FACILITY_NAME -> cube row and grows as new names appear
+    chunk = chunk.dropna(subset=['ENTRY_DATETIME'])
+    for name in chunk['FACILITY_NAME'].unique():
+        facilities.setdefault(name, len(facilities))
+
+    hour = hours_since_epoch(chunk['ENTRY_DATETIME'])
+    fac = chunk['FACILITY_NAME'].map(facilities).to_numpy()
+    keep = hour >= 0
+    hour, fac = hour[keep], fac[keep]
+
+    n_hours = max(cube.shape[1], int(hour.max()) + 1 if len(hour) else 0)
+    if cube.shape != (len(facilities), n_hours):
+        cube = np.pad(cube, ((0, len(facilities) - cube.shape[0]), (0, n_hours - cube.shape[1])))
+
+    # One bincount over the flattened (facility, hour) index instead of a groupby
+    flat = fac * n_hours + hour
+    cube += np.bincount(flat, minlength=cube.size).reshape(cube.shape).astype(cube.dtype)
+    return cube
+
+
+def week_blocks(cube):
+    # (facilities, hours) -> (facilities, weeks, 168) aligned to Monday 00:00, NaN outside the data
+    lead = CUBE_EPOCH.dayofweek * 24 + CUBE_EPOCH.hour
+    n_weeks = -(-(lead + cube.shape[1]) // HOURS_OF_WEEK)
+    blocks = np.full((cube.shape[0], n_weeks * HOURS_OF_WEEK), np.nan)
+    blocks[:, lead:lead + cube.shape[1]] = cube
+    return blocks.reshape(cube.shape[0], n_weeks, HOURS_OF_WEEK), lead
+
+
+def build_hourly_cube(path=TRANSACTIONS_CSV, chunksize=CHUNK_SIZE):
+    facilities = {}
+    cube = np.zeros((0, 0), dtype=np.int32)
+    for chunk in read_transactions_chunked(path, chunksize):
+        cube = add_chunk_to_cube(cube, facilities, chunk)
+    return cube, list(facilities)
+
+
+def save_hourly_cube(cube, facility_names, path=CUBE_PATH):
+    # Several dashboard workers may build the cube at once; each writes its own temporary
+    # file and swaps it in, so readers never see a partial cube
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, counts=cube, facilities=np.array(facility_names), epoch=str(CUBE_EPOCH))
+    os.replace(tmp_path, path)
+
+
+def load_daily_weather(n_days, path=WEATHER_XLSX, columns=('Rainfall', 'Snowfall')):
+    # Daily weather as (n_days, len(columns)) indexed by day offset from CUBE_EPOCH; NaN where
+    # missing, including whole columns the workbook does not have
+    weather = pd.read_excel(path)
+    days = (pd.to_datetime(weather['Date']).dt.normalize() - CUBE_EPOCH).dt.days
+    weather = weather.assign(DAY=days).reindex(columns=['DAY', *columns]).groupby('DAY').mean()
+    return weather.reindex(range(n_days)).to_numpy(dtype=np.float64)
+
+
+def cube_is_stale(path=CUBE_PATH, source=TRANSACTIONS_CSV):
+    # Missing, or older than the transactions file it was built from
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path)
+
+
+def load_hourly_cube(path=CUBE_PATH, rebuild=False):
+    # Returns (counts, facility_names); builds and caches the cube on first use and again
+    # whenever the transactions file is rewritten
+    if rebuild or cube_is_stale(path):
+        cube, facility_names = build_hourly_cube()
+        save_hourly_cube(cube, facility_names, path)
+        return cube, facility_names
+    with np.load(path) as data:
+        return data['counts'], data['facilities'].tolist()
+
+
+if __name__ == '__main__':
+    cube, facility_names = load_hourly_cube(rebuild=True)
+    print(f"Hourly count cube: {len(facility_names)} facilities x {cube.shape[1]:,} hours, {cube.sum():,} entries")
@@ -0,0 +1,182 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from joblib import Parallel, delayed
+
+from ParkingCube import CACHE_DIR, HOURS_OF_WEEK, load_hourly_cube, week_blocks
+from DurationSketches import BIN_VALUES, load_sketches
+
+# Monte Carlo what-if for price changes. Arrivals per facility x hour-of-week come from the
+# hourly count cube, dwell times per facility x hour-of-week from the duration sketches.
+# A scenario scales demand by (1 + price change) ** elasticity in the hours it prices,
+# then many weeks of arrivals and occupancy are simulated as batched NumPy arrays. All
+# scenarios are simulated on the same baseline draws (common random numbers), so the
+# differences between them are the pricing, not Monte Carlo noise.
+
+RESULTS_PATH = os.path.join(CACHE_DIR, 'pricing_scenarios.csv')
+
+# Assuming 100 spaces per facility and a flat hourly rate for demonstration, as in FinalViz2.py;
+# fill in real capacities and rates where known
+SPACES_PER_FACILITY = 100
+FACILITY_CAPACITY = {}
+BASE_HOURLY_RATE = 2.0
+
+# Stays up to a day are resolved to the hour and longer ones (permit and hospital ramps) to
+# the day; stays beyond MAX_DWELL_DAYS count as MAX_DWELL_DAYS
+MAX_DWELL_DAYS = 14
+DWELL_HOURS = np.concatenate([np.arange(1, 25), 24 * np.arange(2, MAX_DWELL_DAYS + 1)])
+# Leading weeks that let the lot fill up from empty before anything is measured
+WARM_UP_WEEKS = -(-DWELL_HOURS[-1] // HOURS_OF_WEEK)
+N_WEEKS = 1000
+WEEKS_PER_BATCH = 50
+N_JOBS = -1
+
+# Weekdays 8 AM - 6 PM
+PEAK_HOURS = np.zeros(HOURS_OF_WEEK, dtype=bool)
+for day in range(5):
+    PEAK_HOURS[day * 24 + 8:day * 24 + 18] = True
+
+SCENARIOS = [
+    {'name': 'Current Pricing', 'price_change': 0.0, 'elasticity': -0.3, 'peak_only': False},
+    {'name': '+25% Peak Hours', 'price_change': 0.25, 'elasticity': -0.3, 'peak_only': True},
+    {'name': '+25% All Hours', 'price_change': 0.25, 'elasticity': -0.3, 'peak_only': False},
+    {'name': '-20% Off-Peak', 'price_change': -0.2, 'elasticity': -0.3, 'off_peak_only': True},
+]
+
+
+def arrival_rates(cube):
+    # Mean entries per facility x hour-of-week over the observed weeks
+    blocks, _ = week_blocks(cube)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nan_to_num(np.nanmean(blocks, axis=1))
+
+
+def dwell_distributions(sketches):
+    # Collapse each duration sketch onto the DWELL_HOURS buckets; p[f, how, k] = P(stay DWELL_HOURS[k] hours).
+    # Stays are rounded up to whole hours; one that falls between two daily buckets is split
+    # between them so the mean stay is kept.
+    hours = np.clip(np.ceil(BIN_VALUES / 60), 1, DWELL_HOURS[-1])
+    upper = np.searchsorted(DWELL_HOURS, hours)
+    lower = np.maximum(upper - 1, 0)
+    span = DWELL_HOURS[upper] - DWELL_HOURS[lower]
+    upper_weight = np.divide(hours - DWELL_HOURS[lower], span, out=np.ones_like(hours), where=span > 0)
+    weights = np.zeros((len(BIN_VALUES), len(DWELL_HOURS)))
+    np.add.at(weights, (np.arange(len(BIN_VALUES)), upper), upper_weight)
+    np.add.at(weights, (np.arange(len(BIN_VALUES)), lower), 1 - upper_weight)
+    counts = sketches @ weights
+    # Hours with no observed stays borrow the facility's overall dwell distribution
+    overall = counts.sum(axis=1, keepdims=True)
+    counts = np.where(counts.sum(axis=2, keepdims=True) > 0, counts, overall)
+    totals = counts.sum(axis=2, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+def simulation_inputs():
+    # Align the cube and the sketches by facility name
+    cube, cube_facilities = load_hourly_cube()
+    sketches, sketch_facilities, _ = load_sketches()
+    facility_names = [name for name in cube_facilities if name in set(sketch_facilities)]
+    rates = arrival_rates(cube)[[cube_facilities.index(name) for name in facility_names]]
+    dwell = dwell_distributions(sketches)[[sketch_facilities.index(name) for name in facility_names]]
+    capacity = np.array([FACILITY_CAPACITY.get(name, SPACES_PER_FACILITY) for name in facility_names])
+    return facility_names, rates, dwell, capacity
+
+
+def demand_multiplier(scenario):
+    priced = np.ones(HOURS_OF_WEEK, dtype=bool)
+    if scenario.get('peak_only'):
+        priced = PEAK_HOURS
+    elif scenario.get('off_peak_only'):
+        priced = ~PEAK_HOURS
+    multiplier = (1 + scenario['price_change']) ** scenario['elasticity']
+    return np.where(priced, multiplier, 1.0), np.where(priced, 1 + scenario['price_change'], 1.0)
+
+
+def scenario_cars(rng, base, cohort_rates, how, multiplier):
+    # The baseline's cars thinned where demand falls, plus extra Poisson cars where it rises;
+    # both are exact for Poisson arrivals and keep the scenario coupled to the baseline
+    m = multiplier[how][None, :, None]
+    if np.all(m == 1):
+        return base
+    return rng.binomial(base, np.minimum(m, 1)) + rng.poisson(cohort_rates[:, how, :] * np.maximum(m - 1, 0))
+
+
+def simulate_batch(rates, dwell, capacity, multipliers, price_factors, n_weeks, seed):
+    # Returns (scenarios, 4, facilities) totals of lot-full weeks, full hours, arrivals and revenue
+    rng = np.random.default_rng(seed)
+    n_facilities = len(rates)
+    # Poisson splitting: cars arriving at hour-of-week h and staying k hours are independent Poisson(rate * p_k)
+    cohort_rates = rates[:, :, None] * dwell
+    how = np.tile(np.arange(HOURS_OF_WEEK), n_weeks + WARM_UP_WEEKS)
+    base = rng.poisson(cohort_rates[:, how, :])
+
+    totals = np.zeros((len(multipliers), 4, n_facilities))
+    for i, (multiplier, price_factor) in enumerate(zip(multipliers, price_factors)):
+        cars = scenario_cars(rng, base, cohort_rates, how, multiplier)
+        arrivals = cars.sum(axis=2)
+        departures = np.zeros((n_facilities, len(how) + DWELL_HOURS[-1]), dtype=arrivals.dtype)
+        for k, stay in enumerate(DWELL_HOURS):
+            departures[:, stay:stay + len(how)] += cars[:, :, k]
+        occupancy = np.cumsum(arrivals - departures[:, :len(how)], axis=1)
+
+        warm_up = WARM_UP_WEEKS * HOURS_OF_WEEK
+        occupancy = occupancy[:, warm_up:].reshape(n_facilities, n_weeks, HOURS_OF_WEEK)
+        arrivals = arrivals[:, warm_up:].reshape(n_facilities, n_weeks, HOURS_OF_WEEK)
+        full = occupancy >= capacity[:, None, None]
+        totals[i, 0] = full.any(axis=2).sum(axis=1)
+        totals[i, 1] = full.sum(axis=(1, 2))
+        totals[i, 2] = arrivals.sum(axis=(1, 2))
+        # Revenue on the occupied space-hours the lot can actually hold
+        totals[i, 3] = (np.minimum(occupancy, capacity[:, None, None]) * price_factor).sum(axis=(1, 2)) * BASE_HOURLY_RATE
+    return totals
+
+
+def run_scenarios(facility_names, rates, dwell, capacity, scenarios=SCENARIOS, n_weeks=N_WEEKS, n_jobs=N_JOBS):
+    # Batches of weeks run in parallel, each with its own random stream shared by every scenario
+    multipliers, price_factors = zip(*(demand_multiplier(scenario) for scenario in scenarios))
+    batches = [min(WEEKS_PER_BATCH, n_weeks - start) for start in range(0, n_weeks, WEEKS_PER_BATCH)]
+    seeds = np.random.SeedSequence(42).spawn(len(batches))
+    totals = sum(Parallel(n_jobs=n_jobs)(
+        delayed(simulate_batch)(rates, dwell, capacity, multipliers, price_factors, weeks, seed)
+        for weeks, seed in zip(batches, seeds)))
+
+    results = []
+    for scenario, (full_weeks, full_hours, arrivals_total, revenue_total) in zip(scenarios, totals):
+        results.append(pd.DataFrame({
+            'FACILITY_NAME': facility_names,
+            'SCENARIO': scenario['name'],
+            'LOT_FULL_WEEK_PROB': full_weeks / n_weeks,
+            'FULL_HOUR_SHARE': full_hours / (n_weeks * HOURS_OF_WEEK),
+            'WEEKLY_ARRIVALS': arrivals_total / n_weeks,
+            'WEEKLY_REVENUE': revenue_total / n_weeks,
+        }))
+    return pd.concat(results, ignore_index=True)
+
+
+if __name__ == '__main__':
+    facility_names, rates, dwell, capacity = simulation_inputs()
+
+    start = time.perf_counter()
+    results = run_scenarios(facility_names, rates, dwell, capacity)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    results.to_csv(RESULTS_PATH, index=False)
+    print(f"Simulated {N_WEEKS:,} weeks x {len(SCENARIOS)} scenarios x {len(facility_names)} facilities in {elapsed:.1f}s")
+
+    fig = make_subplots(rows=2, cols=1, subplot_titles=("Probability of a Lot-Full Week", "Expected Weekly Revenue"),
+                        vertical_spacing=0.15)
+    for name, scenario_data in results.groupby('SCENARIO', sort=False):
+        fig.add_trace(go.Bar(x=scenario_data['FACILITY_NAME'], y=scenario_data['LOT_FULL_WEEK_PROB'],
+                             name=name, legendgroup=name), row=1, col=1)
+        fig.add_trace(go.Bar(x=scenario_data['FACILITY_NAME'], y=scenario_data['WEEKLY_REVENUE'],
+                             name=name, legendgroup=name, showlegend=False), row=2, col=1)
+    fig.update_layout(height=1000, width=1200, barmode='group', title_text="Dynamic Pricing Scenarios")
+    fig.update_yaxes(title_text="Probability", tickformat='.0%', row=1, col=1)
+    fig.update_yaxes(title_text="Revenue ($)", row=2, col=1)
+    fig.show()
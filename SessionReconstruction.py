@@ -0,0 +1,116 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from ParkingCube import CACHE_DIR
+
+# Pairs T2 gate entry/exit events into parking sessions so visits are counted once
+# and dwell times come straight from the gate data.
+
+ENTRY_EXIT_CSV = 'T2_Warehouse_EntryExitIncident_cleaned.csv'
+SESSIONS_PATH = os.path.join(CACHE_DIR, 'gate_sessions.csv')
+UNMATCHED_PATH = os.path.join(CACHE_DIR, 'gate_unmatched_events.csv')
+
+# The export has no per-vehicle key, so events are paired first-in-first-out within
+# each group; add a credential/ticket column here if a future export carries one.
+SESSION_KEYS = ['FACILITY_NAME', 'CREDENTIAL_TYPE']
+# The FIFO queue restarts every service day, so a missed gate read can shift pairings for
+# at most the rest of that day. Days start at the overnight low; a stay across the
+# boundary is reported as an unmatched entry and an unmatched exit rather than paired.
+SERVICE_DAY_START = pd.Timedelta(hours=3)
+
+
+def load_gate_events(path=ENTRY_EXIT_CSV):
+    events = pd.read_csv(path, usecols=['FACILITY_NAME', 'PARKING_TYPE', 'DATE', 'TIME'])
+    events['DATETIME'] = pd.to_datetime(events['DATE'] + ' ' + events['TIME'], errors='coerce')
+    return events
+
+
+def reconstruct_sessions(events, keys=SESSION_KEYS, service_day_start=SERVICE_DAY_START):
+    # 'Valid Credential Exit' -> CREDENTIAL_TYPE='Credential', IS_EXIT=True; incident rows are dropped.
+    # Only a handful of distinct types exist, so parse those once and map the codes.
+    ptype = events['PARKING_TYPE'].astype('category')
+    parts = ptype.cat.categories.str.extract(r'^Valid (\w+) (Entry|Exit)$')
+    credential_codes, credentials = pd.factorize(parts[0])
+    # Trailing -1 so missing PARKING_TYPE (code -1) maps to a missing credential type
+    credential_codes = np.append(credential_codes, -1)[ptype.cat.codes.to_numpy()]
+    type_is_exit = np.append((parts[1] == 'Exit').to_numpy(), False)
+    events = events.assign(CREDENTIAL_TYPE=pd.Categorical.from_codes(credential_codes, credentials),
+                           IS_EXIT=type_is_exit[ptype.cat.codes.to_numpy()])
+    events = events[(credential_codes >= 0) & events['DATETIME'].notna().to_numpy()]
+
+    # Carry the group keys as categorical codes rather than strings; each group is one
+    # facility x credential type x service day
+    key_codes = [events[key].astype('category') for key in keys]
+    service_day = (events['DATETIME'] - service_day_start).dt.normalize()
+    grouped = events.groupby([codes.cat.codes for codes in key_codes] + [service_day], sort=False)
+    group = grouped.ngroup().to_numpy()
+
+    # Sort by group, then time, with entries ahead of exits at the same timestamp
+    when = events['DATETIME'].to_numpy()
+    is_exit = events['IS_EXIT'].to_numpy()
+    order = np.lexsort((is_exit, when, group))
+    group, when, is_exit = group[order], when[order], is_exit[order]
+    key_codes = [(codes.cat.codes.to_numpy()[order], codes.cat.categories) for codes in key_codes]
+
+    # Running open-session balance per group; every new low of the balance is an exit
+    # with no open entry to close
+    balance = pd.Series(np.where(is_exit, -1, 1)).groupby(group).cumsum()
+    unmatched_so_far = (-balance.groupby(group).cummin()).clip(lower=0)
+    exit_unmatched = is_exit & (unmatched_so_far.groupby(group).diff().fillna(unmatched_so_far) > 0).to_numpy()
+    exit_matched = is_exit & ~exit_unmatched
+
+    # FIFO: the n-th matched exit of a group closes the n-th entry of that group. Both
+    # selections are already ordered by (group, time), so they line up index for index.
+    # Entries still open when their service day ends are flagged on that day.
+    n_groups = group.max() + 1 if len(group) else 0
+    matched_per_group = np.bincount(group[exit_matched], minlength=n_groups)
+    is_entry = ~is_exit
+    entry_rank = pd.Series(is_entry).groupby(group).cumsum().to_numpy() - 1
+    entry_matched = is_entry & (entry_rank < matched_per_group[group])
+    entry_unmatched = is_entry & ~entry_matched
+
+    def key_columns(idx):
+        return {key: pd.Categorical.from_codes(codes[idx], categories)
+                for key, (codes, categories) in zip(keys, key_codes)}
+
+    entry_idx = np.flatnonzero(entry_matched)
+    exit_idx = np.flatnonzero(exit_matched)
+    sessions = pd.DataFrame(key_columns(entry_idx))
+    sessions['ENTRY_DATETIME'] = when[entry_idx]
+    sessions['EXIT_DATETIME'] = when[exit_idx]
+    sessions['DURATION_MINUTES'] = ((when[exit_idx] - when[entry_idx]) / np.timedelta64(1, 'm')).astype(np.float32)
+
+    unmatched_idx = np.flatnonzero(entry_unmatched | exit_unmatched)
+    unmatched = pd.DataFrame(key_columns(unmatched_idx))
+    unmatched['DATETIME'] = when[unmatched_idx]
+    unmatched['REASON'] = pd.Categorical(np.where(is_exit[unmatched_idx], 'EXIT_WITHOUT_ENTRY', 'ENTRY_WITHOUT_EXIT'))
+    return sessions, unmatched
+
+
+def save_sessions(sessions, unmatched):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    sessions.to_csv(SESSIONS_PATH, index=False)
+    unmatched.to_csv(UNMATCHED_PATH, index=False)
+
+
+def summarize_sessions(sessions, unmatched, keys=SESSION_KEYS):
+    # True visit counts and dwell times per facility and credential type
+    summary = sessions.groupby(keys, observed=True)['DURATION_MINUTES'].agg(
+        VISITS='size', MEAN_DWELL_MINUTES='mean', MEDIAN_DWELL_MINUTES='median')
+    flags = unmatched.groupby(keys + ['REASON'], observed=True).size().unstack(fill_value=0)
+    return summary.join(flags, how='outer').fillna(0)
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    events = load_gate_events()
+    sessions, unmatched = reconstruct_sessions(events)
+    elapsed = time.perf_counter() - start
+    save_sessions(sessions, unmatched)
+
+    print(f"Reconstructed {len(sessions):,} sessions from {len(events):,} gate events in {elapsed:.1f}s")
+    print(f"Unmatched entries: {(unmatched['REASON'] == 'ENTRY_WITHOUT_EXIT').sum():,}")
+    print(f"Unmatched exits: {(unmatched['REASON'] == 'EXIT_WITHOUT_ENTRY').sum():,}")
+    print(summarize_sessions(sessions, unmatched).to_string())
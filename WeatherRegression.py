@@ -0,0 +1,131 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from ParkingCube import CACHE_DIR, CUBE_EPOCH, load_daily_weather, load_hourly_cube
+from AcademicCalendar import CALENDAR_FEATURES, load_calendar
+
+# Regresses daily entries on weather, calendar and academic-calendar terms for every facility at once. All
+# facilities share the same days and therefore the same design matrix, so the fits are a
+# single least-squares solve with one right-hand side per facility. The dashboard draws
+# the cached coefficients instead of fitting a trendline on every render.
+
+REGRESSION_PATH = os.path.join(CACHE_DIR, 'weather_regression.csv')
+
+WEATHER_TERMS = ['Rainfall', 'Snowfall', 'Temperature']
+# Class days are the baseline SEMESTER would duplicate
+CALENDAR_TERMS = ['FINALS', 'BREAK', 'HOLIDAY', 'HOME_GAME']
+TOTAL_NAME = 'All Facilities'
+days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def daily_counts(cube):
+    # (facilities, days) entry counts; a trailing partial day is dropped
+    n_days = cube.shape[1] // 24
+    return cube[:, :n_days * 24].reshape(cube.shape[0], n_days, 24).sum(axis=2)
+
+
+def design_matrix(weather, terms=WEATHER_TERMS, calendar=None):
+    # Intercept, weather terms, academic-calendar flags, and day-of-week / month indicators
+    # (class days, Monday and January are the baseline)
+    dates = CUBE_EPOCH + pd.to_timedelta(np.arange(len(weather)), unit='D')
+    columns = {'Intercept': np.ones(len(weather))}
+    for i, term in enumerate(terms):
+        columns[term] = weather[:, i]
+    if calendar is not None:
+        for term in CALENDAR_TERMS:
+            columns[term] = calendar[:len(weather), CALENDAR_FEATURES.index(term)].astype(np.float64)
+    for day in range(1, 7):
+        columns[days_order[day]] = (dates.dayofweek == day).astype(np.float64)
+    for month in range(2, 13):
+        columns[pd.Timestamp(2000, month, 1).month_name()] = (dates.month == month).astype(np.float64)
+    return pd.DataFrame(columns)
+
+
+def fit_regressions(counts, facility_names, weather, terms=WEATHER_TERMS, calendar=None):
+    # counts is (facilities, days); returns one row per facility x term
+    X = design_matrix(weather, terms, calendar)
+    # Weather the workbook does not have, and calendar terms that never occur (e.g. HOME_GAME
+    # without a home games file), cannot be estimated
+    X = X.loc[:, X.notna().any() & (X != 0).any()]
+    Y = np.vstack([counts, counts.sum(axis=0)]).T.astype(np.float64)
+    names = list(facility_names) + [TOTAL_NAME]
+
+    # Days with any missing weather are left out of every fit
+    rows = X.notna().all(axis=1).to_numpy()
+    A, Y = X.to_numpy()[rows], Y[rows]
+    n, p = A.shape
+    if n <= p:
+        raise ValueError(f"Only {n} days with complete weather for {p} regression terms")
+
+    beta, _, rank, _ = np.linalg.lstsq(A, Y, rcond=None)
+    if rank < p:
+        raise ValueError('Regression terms are collinear over the days with weather')
+    residuals = Y - A @ beta
+    rss = (residuals ** 2).sum(axis=0)
+    sigma2 = rss / (n - p)
+    # Classical OLS errors: sqrt(sigma^2 * diag((A'A)^-1)) for every facility at once
+    std_err = np.sqrt(np.outer(np.diag(np.linalg.inv(A.T @ A)), sigma2))
+    tss = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+    r2 = 1 - np.divide(rss, tss, out=np.ones_like(rss), where=tss > 0)
+
+    p_terms = len(X.columns)
+    return pd.DataFrame({
+        'FACILITY_NAME': np.repeat(names, p_terms),
+        'TERM': np.tile(X.columns, len(names)),
+        'COEF': beta.T.ravel(),
+        'STD_ERR': std_err.T.ravel(),
+        'T_STAT': np.divide(beta, std_err, out=np.full_like(beta, np.nan), where=std_err > 0).T.ravel(),
+        # Means of each term and of the counts over the fitted days, so a partial-effect line
+        # through (TERM_MEAN, COUNT_MEAN) can be drawn without the data
+        'TERM_MEAN': np.tile(A.mean(axis=0), len(names)),
+        'COUNT_MEAN': np.repeat(Y.mean(axis=0), p_terms),
+        'R2': np.repeat(r2, p_terms),
+        'N_DAYS': n,
+    })
+
+
+def weather_fit_line(regression, term, x_range, facility=TOTAL_NAME):
+    # Partial effect of one term with everything else held at its mean; None if it was not fitted
+    row = regression[(regression['FACILITY_NAME'] == facility) & (regression['TERM'] == term)]
+    if row.empty:
+        return None
+    row = row.iloc[0]
+    x = np.array(x_range, dtype=np.float64)
+    return x, row['COUNT_MEAN'] + row['COEF'] * (x - row['TERM_MEAN']), row
+
+
+def load_weather_regression(path=REGRESSION_PATH):
+    # Returns None until WeatherRegression.py has been run
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path)
+
+
+if __name__ == '__main__':
+    cube, facility_names = load_hourly_cube()
+    counts = daily_counts(cube)
+    weather = load_daily_weather(counts.shape[1], columns=WEATHER_TERMS)
+    calendar = load_calendar(counts.shape[1])
+
+    start = time.perf_counter()
+    regression = fit_regressions(counts, facility_names, weather, calendar=calendar)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    regression.to_csv(REGRESSION_PATH, index=False)
+    print(f"Fit {len(facility_names) + 1} regressions over {regression['N_DAYS'].iloc[0]:,} days in {elapsed * 1000:.1f}ms")
+    weather_rows = regression[regression['TERM'].isin(WEATHER_TERMS)]
+    print(weather_rows.pivot(index='FACILITY_NAME', columns='TERM', values='COEF').round(1).to_string())
+
+    fig = go.Figure()
+    for term in WEATHER_TERMS:
+        rows = weather_rows[weather_rows['TERM'] == term]
+        fig.add_trace(go.Bar(x=rows['FACILITY_NAME'], y=rows['COEF'], name=term,
+                             error_y=dict(type='data', array=1.96 * rows['STD_ERR'])))
+    fig.update_layout(barmode='group', height=700, width=1200,
+                      title='Change in Daily Entries per Inch of Rain / Snow and per Degree (95% CI)',
+                      yaxis_title='Entries per Unit')
+    fig.show()